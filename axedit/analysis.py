@@ -0,0 +1,175 @@
+"""
+Finds the names the Python highlighter colors, off the main thread.
+
+Parsing a module and walking its tree takes tens of milliseconds on large
+files, far too long to do on every keystroke. Once typing pauses, a
+snapshot of the text is parsed by a worker thread, which publishes the
+modules and classes it names along with the buffer version they are for.
+Results for a version that was already superseded are dropped.
+"""
+
+import ast
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from axedit import shared
+from axedit.funcs import get_versioned_text
+from axedit.idle import wake_up
+from axedit.module_checker import is_module, module_index
+from axedit.timers import scheduler
+
+# Seconds typing has to pause before the text is parsed again
+ANALYSIS_DELAY = 0.15
+
+
+@dataclass(slots=True, frozen=True)
+class Names:
+    version: int
+    modules: frozenset[str]
+    classes: frozenset[str]
+
+
+def is_pascal(word: str) -> bool:
+    if not word:
+        return False
+    if word[0] == "_":
+        return is_pascal(word[1:])
+    return word[0].isupper() and word.find("_") == -1
+
+
+def get_import_origin(file_name: str | None, level: int) -> Path | None:
+    """The directory a relative import of `level` dots starts from"""
+
+    folder = Path.cwd() if file_name is None else Path(file_name).absolute().parent
+    folders = [folder, *folder.parents]
+    if level > len(folders):
+        return None
+    return folders[level - 1]
+
+
+class ImportVisitor(ast.NodeVisitor):
+    def __init__(
+        self, modules: set[str], classes: set[str], file_name: str | None
+    ) -> None:
+        self.modules = modules
+        self.classes = classes
+        self.file_name = file_name
+
+    def visit_ImportFrom(self, node: ast.ImportFrom | None):
+        mod_name = node.module
+        if node.module is None:
+            mod_name = "."
+
+        self.modules.update(mod_name.split("."))
+
+        origin = None
+        if node.level:
+            origin = get_import_origin(self.file_name, node.level)
+
+        imports = []
+        for naming_node in node.names:
+            imports.append(naming_node.name)
+            if naming_node.asname is not None:
+                imports.append(naming_node.asname)
+
+        for imp in imports:
+            if (not node.level or origin is not None) and is_module(
+                node.module or "", imp, origin
+            ):
+                self.modules.add(imp)
+            elif is_pascal(imp):
+                self.classes.add(imp)
+
+    def visit_Import(self, node: ast.Import):
+        for naming_node in node.names:
+            self.modules.add(naming_node.name)
+
+            if hasattr(naming_node, "asname"):
+                self.modules.add(naming_node.asname)
+
+
+class ClassVisitor(ast.NodeVisitor):
+    def __init__(self, classes: set[str]) -> None:
+        self.classes = classes
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> Any:
+        self.classes.add(node.name)
+
+
+def find_names(version: int, text: str, file_name: str | None) -> Names | None:
+    """The modules and classes named in `text`, `None` if it does not parse"""
+
+    try:
+        parsed_source = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return None
+
+    modules, classes = set(), set()
+    ImportVisitor(modules, classes, file_name).visit(parsed_source)
+    ClassVisitor(classes).visit(parsed_source)
+    # Keeps the directories looked through for the next run
+    module_index.save()
+    return Names(version, frozenset(modules), frozenset(classes))
+
+
+class NameAnalyzer:
+    def __init__(self) -> None:
+        self.debounce = scheduler.create(ANALYSIS_DELAY, self.submit)
+        self.thread: threading.Thread | None = None
+        self.wanted = threading.Event()
+        self.lock = threading.Lock()
+        # The latest snapshot to analyze, and the latest names found
+        self.snapshot: tuple[int, str, str | None] | None = None
+        self.result: Names | None = None
+
+    def request(self, now: bool = False) -> None:
+        """Analyzes the text once typing pauses, or right away"""
+
+        if now:
+            self.debounce.stop()
+            self.submit()
+        else:
+            self.debounce.start()
+
+    def submit(self) -> None:
+        self.snapshot = *get_versioned_text(), shared.file_name
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.threaded_analysis, daemon=True)
+            self.thread.start()
+        self.wanted.set()
+
+    def threaded_analysis(self) -> None:
+        while True:
+            self.wanted.wait()
+            self.wanted.clear()
+            names = find_names(*self.snapshot)
+            if names is not None:
+                with self.lock:
+                    self.result = names
+                wake_up()
+
+    def is_current(self, names: Names) -> bool:
+        snapshot = self.snapshot
+        return (
+            snapshot is not None
+            and names.version == snapshot[0]
+            # Versions are unique, so this also tells the document apart
+            and shared.chars.events_since(names.version) is not None
+        )
+
+    def has_result(self) -> bool:
+        return self.result is not None
+
+    def take_result(self) -> Names | None:
+        """The names found since the last call, if still for this document"""
+
+        with self.lock:
+            names, self.result = self.result, None
+        if names is None or not self.is_current(names):
+            return None
+        return names
+
+
+name_analyzer = NameAnalyzer()
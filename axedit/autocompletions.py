@@ -11,7 +11,10 @@ import pygame
 import typing_extensions as t
 
 from axedit import shared
-from axedit.funcs import get_text
+from axedit.classes import Pos
+from axedit.compositor import Layer, get_style_key
+from axedit.funcs import get_json_text
+from axedit.idle import BACKGROUND_POLL_INTERVAL, wake_up
 from axedit.logs import logger
 from axedit.state_enums import FileState
 from axedit.utils import Time, highlight_text
@@ -59,12 +62,13 @@ class AutoCompletions:
         )
         thread.start()
         self.completions: list[dict] = []
-        self.gen_blank()
+        self.layer = Layer(self.draw_suggestions, self.get_popup_size)
         self.receiving = False
         self.post_receive_clarity = False
         self.entered_editor = False
+        self.seen_version: int | None = None
 
-    def gen_blank(self):
+    def get_popup_size(self) -> tuple[int, int]:
         try:
             width = (
                 max(len(comp["name"]) for comp in self.completions) + 3
@@ -73,8 +77,7 @@ class AutoCompletions:
         except ValueError:
             width, height = 0, 0
 
-        self.surf = pygame.Surface((width, height))
-        self.surf.fill(shared.theme["light-bg"])
+        return width, height
 
     def spawn_server(self):
         lang_server_path = shared.AXE_FOLDER_PATH / "completions_server.py"
@@ -113,11 +116,14 @@ class AutoCompletions:
             self.post_receive_clarity = True
 
         changed_state = (
-            shared.chars_changed or shared.cursor_x_changed or shared.cursor_y_changed
+            shared.chars.version != self.seen_version
+            or shared.cursor_x_changed
+            or shared.cursor_y_changed
         )
+        self.seen_version = shared.chars.version
         gatekeepers = bool(
             shared.mode == FileState.INSERT
-            and "".join(shared.chars[shared.cursor_pos.y]).strip()
+            and shared.chars[shared.cursor_pos.y].strip()
             and shared.cursor_pos.x > 0
         )
 
@@ -129,11 +135,11 @@ class AutoCompletions:
         return changed_state and gatekeepers
 
     def receive_completions(self):
-        text = get_text()
         loc = (shared.cursor_pos.x, shared.cursor_pos.y + 1)
 
-        data_to_send = {"text": text, "loc": loc, "fuzzy": False}
-        data_to_send = json.dumps(data_to_send)
+        data_to_send = (
+            f'{{"text": {get_json_text()}, "loc": {json.dumps(loc)}, "fuzzy": false}}'
+        )
         l = len(data_to_send.encode())
 
         try:
@@ -171,6 +177,7 @@ class AutoCompletions:
         self.completions = json.loads(received_data)
         self.filter_completions()
         self.selected_index = 0
+        wake_up()
 
     def close_connections(self):
         if hasattr(self, "client_socket"):
@@ -183,12 +190,8 @@ class AutoCompletions:
             return
 
         diff = shared.cursor_pos.x - self.get_selected_prefix_len()
-        shared.chars[shared.cursor_pos.y][diff:] = (
-            list(self.get_selected_name())
-            + shared.chars[shared.cursor_pos.y][shared.cursor_pos.x :]
-        )
-        shared.cursor_pos.x += (
-            len(self.get_selected_name()) - self.get_selected_prefix_len()
+        shared.cursor_pos = shared.chars.replace(
+            Pos(diff, shared.cursor_pos.y), shared.cursor_pos, self.get_selected_name()
         )
 
     def filter_completions(self):
@@ -213,7 +216,7 @@ class AutoCompletions:
         while True:
             to_upd = self.to_update()
             if not self.connected or not self.entered_editor or not to_upd:
-                time.sleep(0)
+                time.sleep(BACKGROUND_POLL_INTERVAL)
                 continue
 
             try:
@@ -247,7 +250,9 @@ class AutoCompletions:
         self.shuffle_suggestions()
         self.on_enter()
 
-    def draw_suggestions(self) -> None:
+    def draw_suggestions(self, surf: pygame.Surface) -> None:
+        self.surf = surf
+        self.surf.fill(shared.theme["light-bg"])
         for index, comp in enumerate(self.completions):
             symbol: Symbol = Symbol.get_from_comp_type(comp["type"])
             symbol_surf = shared.FONT.render(symbol.icon, True, symbol.color)
@@ -289,10 +294,21 @@ class AutoCompletions:
             return self.completions[self.selected_index]["prefix-len"]
         return 0
 
+    def get_damage_key(self) -> tuple:
+        """What the drawn suggestions look like, for the compositor"""
+
+        if not self.completions:
+            return ()
+        return (
+            tuple((comp["name"], comp["prefix-len"]) for comp in self.completions),
+            self.selected_index,
+            shared.cursor_pos.x,
+            shared.cursor_pos.y,
+        )
+
     def draw(self, editor_surf: pygame.Surface):
-        self.gen_blank()
-        self.draw_suggestions()
+        self.layer.update((get_style_key(), self.get_damage_key()))
 
         x = shared.cursor_pos.x * shared.FONT_WIDTH
         y = ((shared.cursor_pos.y + 1) * shared.FONT_HEIGHT) + shared.scroll.y
-        editor_surf.blit(self.surf, (x, y))
+        self.layer.draw(editor_surf, (x, y))
@@ -0,0 +1,598 @@
+"""
+The text buffer that backs the editor.
+
+The document is kept as a line index: one immutable `str` per line.
+Every consumer in the editor (renderer, cursor motions, lints) works in
+(x, y) coordinates, so a line lookup has to be O(1). Edits splice the
+affected lines only, so inserting or removing lines just moves pointers.
+
+Typing rebuilds the string of the edited line only. The renderer and
+the cursor read that line as a `str` every frame anyway, so keeping it
+in any other form would only move the join to the next read.
+
+Every edit bumps `TextBuffer.version` and is recorded as an `EditEvent`,
+so subscribers can redo work for the changed lines only. The buffer's
+`HistoryManager` is told about every edit, so nothing has to record undo
+steps by hand.
+
+The lengths of all lines are kept in a `LineLengths` multiset updated by
+every edit, so the longest line is known without scanning the document.
+
+The whole text, which the servers and the analyzer are sent, is kept
+joined in `TextBlocks` of lines. Taking it after an edit only joins the
+blocks the edit touched again.
+
+Very large files keep their lines in a `MappedLines` instead of a list,
+see `TextBuffer.from_mapped_file`.
+"""
+
+import heapq
+import itertools
+import json
+import threading
+from collections import Counter, deque
+from dataclasses import dataclass
+
+import typing_extensions as t
+
+from axedit import shared
+from axedit.classes import Pos
+from axedit.input_queue import HistoryManager
+from axedit.mapped_lines import MappedLines
+
+T = t.TypeVar("T")
+
+_IMPORT_PREFIXES = ("import", "from")
+EVENT_LOG_SIZE = 512
+# Lines joined together in each of the `TextBlocks`
+TEXT_BLOCK_LINES = 256
+
+# Versions are unique across buffers, so a version
+# also tells which document it was taken from
+_versions = itertools.count(1)
+
+
+@dataclass(slots=True, frozen=True)
+class EditEvent:
+    """
+    A single edit to the buffer.
+
+    As text: `old_length` characters at `start` were replaced by `new_text`.
+    As lines: `old_line_count` lines starting at `y` were replaced by
+    `new_line_count` lines.
+    """
+
+    version: int
+    previous_version: int
+    start: Pos
+    old_length: int
+    new_text: str
+    y: int
+    old_line_count: int
+    new_line_count: int
+    import_line: bool
+
+    @property
+    def line_delta(self) -> int:
+        return self.new_line_count - self.old_line_count
+
+
+class LineLengths:
+    """A multiset of line lengths that knows its maximum"""
+
+    def __init__(self, lengths: t.Iterable[int] = ()) -> None:
+        self._counts: Counter[int] = Counter(lengths)
+        # Max heap of negated lengths. A length that is no longer counted
+        # stays in it until it reaches the top
+        self._heap = [-length for length in self._counts]
+        heapq.heapify(self._heap)
+        self._in_heap = set(self._counts)
+
+    def add(self, length: int) -> None:
+        self._counts[length] += 1
+        if length not in self._in_heap:
+            heapq.heappush(self._heap, -length)
+            self._in_heap.add(length)
+
+    def remove(self, length: int) -> None:
+        count = self._counts.pop(length, 0)
+        if count > 1:
+            self._counts[length] = count - 1
+
+    def update(self, removed: t.Iterable[int], added: t.Iterable[int]) -> None:
+        for length in removed:
+            self.remove(length)
+        for length in added:
+            self.add(length)
+
+    def max(self) -> int:
+        while self._heap and -self._heap[0] not in self._counts:
+            self._in_heap.discard(-heapq.heappop(self._heap))
+        return -self._heap[0] if self._heap else 0
+
+
+class TextBlocks:
+    """
+    The text of a buffer in blocks of joined and encoded lines, the
+    blocks edited since the text was last taken are joined again
+    """
+
+    def __init__(self, encode: t.Callable[[str], str]) -> None:
+        self.encode = encode
+        self.version: int | None = None
+        self.text = ""
+        self.line_counts: list[int] = []
+        # `None` for blocks that were edited
+        self.texts: list[str | None] = []
+
+    def get_text(self, buffer: "TextBuffer") -> str:
+        """The encoded text of `buffer`, taken while holding its lock"""
+
+        line_count = len(buffer)
+        if self.version == buffer.version and sum(self.line_counts) == line_count:
+            return self.text
+
+        events = None
+        if self.version is not None:
+            events = buffer.events_since(self.version)
+        # Every edit that adds lines can leave a short block behind
+        max_blocks = 2 * line_count // TEXT_BLOCK_LINES + 16
+        if events is None or len(self.line_counts) > max_blocks:
+            self.line_counts, self.texts = [line_count], [None]
+        else:
+            for event in events:
+                self.forget(event)
+            # A mapped file that is still being indexed grows at its end
+            self.line_counts.append(line_count - sum(self.line_counts))
+            self.texts.append(None)
+
+        self.join(buffer)
+        self.version = buffer.version
+        self.text = "".join(self.texts)
+        return self.text
+
+    def forget(self, event: EditEvent) -> None:
+        """Merges the blocks an edit touched into one edited block"""
+
+        first, start = 0, 0
+        last_block = len(self.line_counts) - 1
+        while first < last_block and start + self.line_counts[first] <= event.y:
+            start += self.line_counts[first]
+            first += 1
+
+        last, end = first, start + self.line_counts[first]
+        while last < last_block and end < event.y + event.old_line_count:
+            last += 1
+            end += self.line_counts[last]
+
+        self.line_counts[first : last + 1] = [end - start + event.line_delta]
+        self.texts[first : last + 1] = [None]
+
+    def join(self, buffer: "TextBuffer") -> None:
+        """Joins the edited blocks again, split into `TEXT_BLOCK_LINES` lines"""
+
+        line_counts, texts = [], []
+        y = 0
+        for line_count, text in zip(self.line_counts, self.texts):
+            end = y + line_count
+            if text is not None:
+                line_counts.append(line_count)
+                texts.append(text)
+            else:
+                for start in range(y, end, TEXT_BLOCK_LINES):
+                    lines = buffer[start : min(start + TEXT_BLOCK_LINES, end)]
+                    line_counts.append(len(lines))
+                    texts.append(self.encode("\n".join(lines) + "\n"))
+            y = end
+
+        self.line_counts, self.texts = line_counts, texts
+
+
+class TextBuffer:
+    """Line indexed text buffer
+
+    Lines never contain the newline character and the
+    buffer always holds at least one (possibly empty) line.
+    """
+
+    def __init__(self, lines: t.Iterable[str] | None = None) -> None:
+        self._lines: list[str] | MappedLines = [] if lines is None else list(lines)
+        if not self._lines:
+            self._lines.append("")
+
+        # The servers read the text from their own threads
+        self._lock = threading.RLock()
+        # Measured on first use, a mapped file is only indexed in the background
+        self._lengths: LineLengths | None = None
+
+        self.version = next(_versions)
+        self.frame_events: list[EditEvent] = []
+        self._event_log: deque[EditEvent] = deque(maxlen=EVENT_LOG_SIZE)
+        self.history = HistoryManager(self)
+        self._text = TextBlocks(str)
+        # Escaping characters one by one, blocks encode like the whole text
+        self._json_text = TextBlocks(lambda text: json.dumps(text)[1:-1])
+
+    @classmethod
+    def from_text(cls, text: str) -> t.Self:
+        return cls(split_lines(text))
+
+    @classmethod
+    def from_mapped_file(cls, path: str, encoding: str) -> t.Self:
+        """Opens a file without reading it, lines are loaded as they are used"""
+
+        buffer = cls()
+        buffer._lines = MappedLines(path, encoding)
+        return buffer
+
+    @property
+    def mapped(self) -> bool:
+        return isinstance(self._lines, MappedLines)
+
+    def unmap(self) -> None:
+        """Reads the rest of a mapped file in, so the file can be overwritten"""
+
+        with self._lock:
+            if not self.mapped:
+                return
+            mapped_lines = self._lines
+            self._lines = list(mapped_lines)
+            mapped_lines.close()
+            # Counted as the lines were read, which is the same unless the file
+            # mixes line endings
+            self._lengths = LineLengths(map(len, self._lines))
+
+    # Reading
+
+    def line_count(self) -> int:
+        return len(self._lines)
+
+    def line_at(self, y: int) -> str:
+        return self._lines[y]
+
+    def max_line_length(self) -> int:
+        """Length of the longest line"""
+
+        with self._lock:
+            if self._lengths is None and self.mapped and self._lines.indexing:
+                # Rather than wait for the whole file, what was indexed so far
+                return self._lines.longest_indexed_line()
+            return self._line_lengths().max()
+
+    def slice(self, start: Pos, end: Pos) -> str:
+        """Text between two positions, `end` being exclusive"""
+
+        start, end = self._clamp(start), self._clamp(end)
+        if start.y == end.y:
+            return self._lines[start.y][start.x : end.x]
+
+        parts = [self._lines[start.y][start.x :]]
+        parts.extend(self._lines[start.y + 1 : end.y])
+        parts.append(self._lines[end.y][: end.x])
+        return "\n".join(parts)
+
+    def get_text(self) -> str:
+        return self.get_versioned_text()[1]
+
+    def get_versioned_text(self) -> tuple[int, str]:
+        """The text along with the version it is the text of"""
+
+        with self._lock:
+            return self.version, self._text.get_text(self)
+
+    def get_versioned_json_text(self) -> tuple[int, str]:
+        """The text encoded as a JSON string, along with its version"""
+
+        with self._lock:
+            return self.version, f'"{self._json_text.get_text(self)}"'
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    @t.overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @t.overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index):
+        return self._lines[index]
+
+    def __iter__(self) -> t.Iterator[str]:
+        return iter(self._lines)
+
+    # Writing
+
+    def insert(self, pos: Pos, text: str) -> Pos:
+        """Inserts text at `pos` and returns the position right after it"""
+
+        pos = self._clamp(pos)
+        if "\n" not in text:
+            self._edit_line(pos.y, pos.x, 0, text)
+            return Pos(pos.x + len(text), pos.y)
+
+        line = self._lines[pos.y]
+        new_lines = text.split("\n")
+        end_x = len(new_lines[-1])
+
+        new_lines[0] = line[: pos.x] + new_lines[0]
+        new_lines[-1] += line[pos.x :]
+        self._splice(pos.y, pos.y + 1, new_lines, pos, 0, text)
+
+        return Pos(end_x, pos.y + len(new_lines) - 1)
+
+    def delete(self, start: Pos, end: Pos) -> str:
+        """Deletes the text between two positions and returns it"""
+
+        start, end = self._clamp(start), self._clamp(end)
+        if start.y == end.y:
+            return self._edit_line(start.y, start.x, end.x - start.x, "")
+
+        deleted = self.slice(start, end)
+        joined = self._lines[start.y][: start.x] + self._lines[end.y][end.x :]
+        self._splice(start.y, end.y + 1, [joined], start, len(deleted), "")
+
+        return deleted
+
+    def replace(self, start: Pos, end: Pos, text: str) -> Pos:
+        """Replaces the text between two positions, returns the end of `text`"""
+
+        start = self._clamp(start)
+        self.apply_edits([(start, end, text)])
+
+        lines = text.split("\n")
+        if len(lines) == 1:
+            return Pos(start.x + len(text), start.y)
+        return Pos(len(lines[-1]), start.y + len(lines) - 1)
+
+    def apply_edits(self, edits: t.Iterable[tuple[Pos, Pos, str]]) -> None:
+        """
+        Replaces several non-overlapping `(start, end, text)` ranges as one
+        undo step. Edits sharing a line are spliced together, every other
+        edit is recorded on its own so only the lines it touched are dirty
+        """
+
+        edits = sorted(
+            (
+                (self._clamp(start), self._clamp(end), text)
+                for start, end, text in edits
+            ),
+            key=lambda edit: (edit[0].y, edit[0].x, edit[1].y, edit[1].x),
+        )
+        for (_, end, _), (start, _, _) in zip(edits, edits[1:]):
+            if (start.y, start.x) < (end.y, end.x):
+                raise ValueError("edits overlap")
+
+        groups: list[list[tuple[Pos, Pos, str]]] = []
+        for edit in edits:
+            if groups and edit[0].y <= groups[-1][-1][1].y:
+                groups[-1].append(edit)
+            else:
+                groups.append([edit])
+
+        self._apply_each(groups, self._replace_ranges)
+
+    def apply_line_edits(self, edits: t.Iterable[tuple[int, int, list[str]]]) -> None:
+        """
+        Replaces several non-overlapping `(start, end, lines)` line ranges
+        as one undo step, each recorded as an edit of its own lines
+        """
+
+        edits = sorted(edits, key=lambda edit: (edit[0], edit[1]))
+        for (_, end, _), (start, _, _) in zip(edits, edits[1:]):
+            if start < end:
+                raise ValueError("edits overlap")
+
+        self._apply_each(edits, lambda edit: self._replace_line_range(*edit))
+
+    def insert_lines(self, y: int, lines: list[str]) -> None:
+        self.replace_lines(y, 0, lines)
+
+    def delete_lines(self, y: int, count: int = 1) -> list[str]:
+        """Removes whole lines and returns them"""
+
+        return self.replace_lines(y, count, [])
+
+    def replace_lines(self, y: int, count: int, lines: list[str]) -> list[str]:
+        """Replaces `count` whole lines from `y` and returns the old ones"""
+
+        return self._replace_line_range(y, y + count, lines)
+
+    # Edit events
+
+    def events_since(self, version: int) -> list[EditEvent] | None:
+        """
+        Events applied after `version`, oldest first.
+        `None` if they are no longer known and a full refresh is needed.
+        """
+
+        if version == self.version:
+            return []
+
+        log = list(self._event_log)
+        for index in range(len(log) - 1, -1, -1):
+            if log[index].previous_version == version:
+                return log[index:]
+
+        return None
+
+    def clear_frame_events(self) -> None:
+        self.frame_events.clear()
+
+    def _record(
+        self,
+        start: Pos,
+        old_length: int,
+        new_text: str,
+        y: int,
+        old_line_count: int,
+        new_line_count: int,
+        import_line: bool,
+    ) -> None:
+        event = EditEvent(
+            version=next(_versions),
+            previous_version=self.version,
+            start=Pos(start.x, start.y),
+            old_length=old_length,
+            new_text=new_text,
+            y=y,
+            old_line_count=old_line_count,
+            new_line_count=new_line_count,
+            import_line=import_line,
+        )
+        self.version = event.version
+        self.frame_events.append(event)
+        self._event_log.append(event)
+        self.history.after_edit(event)
+        shared.chars_changed = True
+
+    # Internals
+
+    def _edit_line(self, y: int, x: int, count: int, text: str) -> str:
+        """Edits within a single line"""
+
+        with self._lock:
+            self.history.before_edit(y, 1)
+            lengths = self._line_lengths()
+            line = self._lines[y]
+            deleted = line[x : x + count]
+            new_line = line[:x] + text + line[x + count :]
+            self._lines[y] = new_line
+            lengths.update((len(line),), (len(new_line),))
+
+            import_line = _is_import_edit([line, new_line])
+            self._record(Pos(x, y), len(deleted), text, y, 1, 1, import_line)
+        return deleted
+
+    def _splice(
+        self,
+        start: int,
+        end: int,
+        new_lines: list[str],
+        edit_start: Pos,
+        old_length: int,
+        new_text: str,
+    ) -> list[str]:
+        """Replaces lines `start` to `end` and returns the old ones"""
+
+        with self._lock:
+            self.history.before_edit(start, end - start)
+            lengths = self._line_lengths()
+
+            old_lines = self._lines[start:end]
+            self._lines[start:end] = new_lines
+            added_lines = new_lines
+            if not self._lines:
+                added_lines = [""]
+                self._lines.append("")
+            new_line_count = len(added_lines)
+            lengths.update(map(len, old_lines), map(len, added_lines))
+
+            self._record(
+                edit_start,
+                old_length,
+                new_text,
+                start,
+                len(old_lines),
+                new_line_count,
+                _is_import_edit(old_lines) or _is_import_edit(new_lines),
+            )
+        return old_lines
+
+    def _apply_each(self, edits: list[T], apply: t.Callable[[T], t.Any]) -> None:
+        """
+        Applies edits sorted top to bottom, bottom up so the line numbers of
+        the ones left stay valid, in a single undo step
+        """
+
+        if len(edits) <= 1:
+            for edit in edits:
+                apply(edit)
+            return
+
+        with self._lock, self.history.batch():
+            for edit in reversed(edits):
+                apply(edit)
+
+    def _replace_ranges(self, edits: list[tuple[Pos, Pos, str]]) -> None:
+        """Splices `(start, end, text)` ranges of the same lines at once"""
+
+        first_y = edits[0][0].y
+        last_y = edits[-1][1].y
+        parts = []
+        position = Pos(0, first_y)
+        for start, end, text in edits:
+            parts.append(self.slice(position, start))
+            parts.append(text)
+            position = end
+        parts.append(self.slice(position, Pos(len(self._lines[last_y]), last_y)))
+
+        self._replace_line_range(first_y, last_y + 1, "".join(parts).split("\n"))
+
+    def _replace_line_range(self, start: int, end: int, lines: list[str]) -> list[str]:
+        old_length = sum(len(line) + 1 for line in self._lines[start:end])
+        new_text = "".join(line + "\n" for line in lines)
+        return self._splice(start, end, lines, Pos(0, start), old_length, new_text)
+
+    def _line_lengths(self) -> LineLengths:
+        if self._lengths is None:
+            if self.mapped:
+                self._lengths = LineLengths(self._lines.original_line_lengths())
+            else:
+                self._lengths = LineLengths(map(len, self._lines))
+        return self._lengths
+
+    def _clamp(self, pos: Pos) -> Pos:
+        y = min(max(pos.y, 0), len(self._lines) - 1)
+        x = min(max(pos.x, 0), self._line_length(y))
+        return Pos(x, y)
+
+    def _line_length(self, y: int) -> int:
+        return len(self._lines[y])
+
+
+def split_lines(text: str) -> list[str]:
+    """Lines of `text`, a trailing newline does not start another line"""
+
+    lines = text.split("\n")
+    if len(lines) > 1 and not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _is_import_edit(lines: t.Iterable[str]) -> bool:
+    return any(line.startswith(_IMPORT_PREFIXES) for line in lines)
+
+
+def dirty_line_ranges(events: t.Iterable[EditEvent]) -> list[tuple[int, int]]:
+    """
+    Merged `(start, end)` line ranges touched by `events`,
+    in the coordinates of the buffer after the last of them
+    """
+
+    ranges: list[tuple[int, int]] = []
+    for event in events:
+        old_end = event.y + event.old_line_count
+        delta = event.line_delta
+        block_start, block_end = event.y, event.y + event.new_line_count
+
+        shifted = []
+        for start, end in ranges:
+            if start >= old_end:
+                shifted.append((start + delta, end + delta))
+            elif end <= event.y:
+                shifted.append((start, end))
+            else:
+                block_start = min(block_start, start)
+                block_end = max(block_end, end + delta)
+        shifted.append((block_start, block_end))
+        ranges = sorted(shifted)
+
+    merged: list[tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
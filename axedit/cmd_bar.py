@@ -15,7 +15,8 @@ from axedit.funcs import (
 )
 from axedit.state_enums import State
 from axedit.themes import apply_theme, get_available_theme_names
-from axedit.utils import Time, render_at
+from axedit.timers import scheduler
+from axedit.utils import render_at
 
 
 def calculate_number_of_rows(
@@ -103,8 +104,8 @@ class CommandBar:
         self._text = ""
         self.color = shared.theme["light-bg"]
         self.command_invalidated = False
-        self.backspace_timer = Time(0.1)
-        self.blink_timer = Time(0.5)
+        self.backspace_timer = scheduler.create(0.1)
+        self.blink_timer = scheduler.every(0.5, self.on_blink, lease=True)
         self.cursors = itertools.cycle(("|", "_"))
         self.current_cursor = next(self.cursors)
         self.suggestion_surf: pygame.Surface | None = None
@@ -246,8 +247,10 @@ class CommandBar:
 
     def on_backspace(self):
         self.current_cursor = "|"
-        if not self.backspace_timer.tick():
+        # Held down, it deletes again once the timer ran out
+        if self.backspace_timer.active:
             return
+        self.backspace_timer.start()
         if self.command_invalidated:
             self.empty_command()
             shared.typing_cmd = False
@@ -284,7 +287,7 @@ class CommandBar:
 
         # On Release
         if shared.kr[pygame.K_BACKSPACE]:
-            self.backspace_timer.reset()
+            self.backspace_timer.stop()
 
         # Events
         for event in shared.events:
@@ -302,12 +305,15 @@ class CommandBar:
         elif shared.kp[pygame.K_ESCAPE]:
             self.on_escape()
 
+    def on_blink(self):
+        if not self.command_invalidated:
+            self.current_cursor = next(self.cursors)
+
     def update_cursor(self):
         if self.command_invalidated:
             self.current_cursor = ""
             return
-        if self.blink_timer.tick():
-            self.current_cursor = next(self.cursors)
+        self.blink_timer.keep_alive()
 
     def execute_raise_subsidaries(self, command: Command):
         self.commands = [
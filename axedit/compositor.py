@@ -0,0 +1,106 @@
+"""
+Presents only the parts of the screen that changed.
+
+Every component still draws into `shared.screen` each frame, but the
+window is only updated where something reported damage. A component
+describes what it shows with a hashable key, and its area is damaged
+when that key or the area itself changes, so a blinking cursor pushes
+a single character cell instead of the whole window.
+
+The same keys drive `Layer`s, retained surfaces that are only redrawn
+when what they show changes and are otherwise just blitted.
+"""
+
+import typing as t
+
+import pygame
+
+from axedit import shared
+
+RectLike = pygame.Rect | tuple[int, int, int, int]
+
+
+class Compositor:
+    def __init__(self) -> None:
+        self.rects: list[pygame.Rect] = []
+        self.everything = True
+        # What each component showed last, and where
+        self.shown: dict[str, tuple[t.Hashable, pygame.Rect]] = {}
+
+    def damage(self, rect: RectLike) -> None:
+        rect = pygame.Rect(rect).clip(shared.srect)
+        if rect.width > 0 and rect.height > 0:
+            self.rects.append(rect)
+
+    def damage_all(self) -> None:
+        self.everything = True
+
+    def show(self, name: str, key: t.Hashable, rect: RectLike) -> None:
+        """Damages the area of component `name` if what it shows changed"""
+
+        rect = pygame.Rect(rect)
+        previous = self.shown.get(name)
+        if previous == (key, rect):
+            return
+
+        self.shown[name] = key, rect
+        self.damage(rect)
+        if previous is not None and previous[1] != rect:
+            self.damage(previous[1])
+
+    def hide(self, name: str) -> None:
+        """Damages where component `name` was, it is not drawn anymore"""
+
+        previous = self.shown.pop(name, None)
+        if previous is not None:
+            self.damage(previous[1])
+
+    def present(self) -> None:
+        if self.everything:
+            pygame.display.flip()
+        elif self.rects:
+            pygame.display.update(self.rects)
+
+        self.rects.clear()
+        self.everything = False
+
+
+class Layer:
+    """A retained surface, redrawn only when the key describing it changes"""
+
+    def __init__(
+        self,
+        draw: t.Callable[[pygame.Surface], None],
+        get_size: t.Callable[[], tuple[int, int]] | None = None,
+    ) -> None:
+        self.draw_contents = draw
+        self.get_size = get_size or (lambda: shared.srect.size)
+        self.surf: pygame.Surface | None = None
+        self.key: t.Hashable = None
+        # The part of `surf` that is not transparent
+        self.bounds = pygame.Rect(0, 0, 0, 0)
+
+    def update(self, key: t.Hashable) -> None:
+        size = self.get_size()
+        if self.surf is None or self.surf.get_size() != size:
+            self.surf = pygame.Surface(size, pygame.SRCALPHA)
+        elif key == self.key:
+            return
+
+        self.key = key
+        self.surf.fill((0, 0, 0, 0))
+        self.draw_contents(self.surf)
+        self.bounds = self.surf.get_bounding_rect()
+
+    def draw(self, target: pygame.Surface, pos: t.Sequence[float] = (0, 0)) -> None:
+        if self.bounds:
+            target.blit(self.surf, self.bounds.move(pos), self.bounds)
+
+
+def get_style_key() -> tuple:
+    """Changes whenever the same text would be drawn differently"""
+
+    return shared.FONT_SIZE, *shared.theme.values()
+
+
+compositor = Compositor()
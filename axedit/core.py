@@ -5,6 +5,7 @@ from pygame._sdl2 import Window
 
 from axedit import shared
 from axedit.autocompletions import AutoCompletions
+from axedit.compositor import compositor
 from axedit.debugger import Debugger
 from axedit.funcs import (
     get_icon,
@@ -13,10 +14,11 @@ from axedit.funcs import (
     set_windows_title_bar_color,
     write_config,
 )
-from axedit.input_queue import HistoryManager
+from axedit.idle import IdleLoop
 from axedit.linter import Linter
 from axedit.logs import logger
 from axedit.states import StateManager
+from axedit.timers import scheduler
 
 
 class Core:
@@ -29,7 +31,6 @@ class Core:
         shared.autocompletion = AutoCompletions()
         shared.linter = Linter()
         self.debugger = Debugger()
-        shared.history = HistoryManager()
         logger.info("CORE INITIALIZED")
 
     def win_init(self):
@@ -49,6 +50,7 @@ class Core:
         shared.srect = shared.screen.get_rect()
         shared.frame_cache = {}
         shared.clock = pygame.Clock()
+        shared.idle_loop = IdleLoop(self.fps)
         window = Window.from_display_module()
         window.opacity = float(shared.config["opacity"]["value"])
 
@@ -65,23 +67,30 @@ class Core:
                 shared.running = False
             elif event.type == pygame.VIDEORESIZE:
                 shared.srect = shared.screen.get_rect()
+                compositor.damage_all()
+            elif event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+                compositor.damage_all()
 
     def shared_frame_refresh(self):
         shared.frame_cache.clear()
-        shared.events = pygame.event.get()
-        shared.dt = shared.clock.tick(self.fps) / 1000
+        waited_events = shared.idle_loop.wait()
+        shared.events = waited_events + pygame.event.get()
         shared.dt = min(shared.dt, 0.1)
         shared.keys = pygame.key.get_pressed()
         shared.kp = pygame.key.get_just_pressed()
         shared.kr = pygame.key.get_just_released()
+        scheduler.update()
         shared.mouse_pos = pygame.Vector2(pygame.mouse.get_pos())
         shared.theme_changed = False
+        shared.animating = False
         shared.mouse_press = pygame.mouse.get_pressed()
 
     def update(self):
         self.shared_frame_refresh()
         self.event_handler()
         self.state_manager.update()
+        if shared.theme_changed or shared.font_offset:
+            compositor.damage_all()
         if shared.theme_changed:
             if platform.system == "Windows":
                 set_windows_title_bar_color()
@@ -93,12 +102,13 @@ class Core:
         shared.screen.fill(shared.theme["default-bg"])
         self.state_manager.draw()
         # self.debugger.draw()
-        pygame.display.flip()
+        compositor.present()
 
     def run(self):
         while shared.running:
             self.update()
             self.draw()
+            shared.idle_loop.end_frame()
 
         write_config()
         safe_close_connections()
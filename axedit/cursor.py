@@ -3,13 +3,15 @@ from functools import partial
 import pygame
 
 from axedit import shared
-from axedit.classes import CharList
+from axedit.classes import Pos
+from axedit.compositor import Layer, get_style_key
 from axedit.funcs import center_cursor
 from axedit.input_queue import AcceleratedKeyPress, RegexManager
 from axedit.logs import logger
 from axedit.modal import *
+from axedit.render_cache import glyph_atlas
 from axedit.state_enums import FileState
-from axedit.utils import Time
+from axedit.timers import scheduler
 
 
 class Cursor:
@@ -28,9 +30,11 @@ class Cursor:
 
     def __init__(self) -> None:
         self.gen_image()
+        self.selection_layer = Layer(self.highlight_selected_text)
+        self.cell_layer = Layer(self.draw_cell, self.get_cell_size)
         self.pos = pygame.Vector2()
         self.rect = self.image.get_rect(topleft=self.pos)
-        self.blink_timer = Time(0.5)
+        self.blink_timer = scheduler.every(0.5, self.on_blink, lease=True)
         self.cursor_visible = True
         self.direction = -1
         self.accels = [
@@ -41,13 +45,13 @@ class Cursor:
             AcceleratedKeyPress(key, partial(self.handle_input, key))
             for key in self.NORMAL_KEYS
         ]
-        self.move_timer = Time(0.5)
         self.regex_manager = RegexManager(
             {
                 r"^(\d+)?(dd|d\d+d)$": on_dd,
                 "zz": on_zz,
                 "gg": on_gg,
                 "G": on_G,
+                "u": on_u,
                 r"w": on_w,
                 r"p": on_p,
                 r"\$": on_dollar_sign,
@@ -62,17 +66,19 @@ class Cursor:
         self.image = pygame.Surface((shared.FONT_WIDTH, shared.FONT_HEIGHT))
         self.image.fill(shared.theme["default-fg"])
 
+    def get_cell_size(self) -> tuple[int, int]:
+        return shared.FONT_WIDTH, shared.FONT_HEIGHT
+
     def move(self):
         self.pos.x = (shared.cursor_pos.x * shared.FONT_WIDTH) - shared.scroll.x
         self.pos.y = (shared.cursor_pos.y * shared.FONT_HEIGHT) + shared.scroll.y
 
-    def blink(self):
-        if self.blink_timer.tick():
-            self.cursor_visible = not self.cursor_visible
+    def on_blink(self):
+        self.cursor_visible = not self.cursor_visible
 
     def handle_cursor_delta(self, move: tuple):
         self.cursor_visible = True
-        self.blink_timer.reset()
+        self.blink_timer.start()
 
         line_len = len(shared.chars[shared.cursor_pos.y])
         limit = 0 if shared.mode == FileState.INSERT else -1
@@ -117,9 +123,8 @@ class Cursor:
         # return out
         return line.strip()
 
-    def get_cursor_shift(self, remaining_line: list):
+    def get_cursor_shift(self, remaining_line: str):
         cursor_shift = 0
-        remaining_line = "".join(remaining_line)
         purified = self.purifier(remaining_line)
         for char in purified:
             if char in (" ", ".", ":"):
@@ -191,7 +196,9 @@ class Cursor:
         if shared.cursor_pos.x > row_len - 1:
             shared.cursor_pos.x = row_len
 
-    def highlight_selected_text(self, editor_surf: pygame.Surface):
+    def get_selected_rows(self) -> list[tuple[int, int, int]]:
+        """`(row, offset, size)` of every selected row, top to bottom"""
+
         options_x = (shared.cursor_pos.x, shared.visual_mode_axis.x)
         options_y = (shared.cursor_pos.y, shared.visual_mode_axis.y)
 
@@ -201,22 +208,8 @@ class Cursor:
         lower_meniscus_y = min(options_y)
         upper_meniscus_y = max(options_y)
 
-        final_surf = pygame.Surface(
-            (
-                shared.srect.width,
-                (upper_meniscus_y - lower_meniscus_y + 1) * shared.FONT_HEIGHT,
-            ),
-            pygame.SRCALPHA,
-        )
-
-        if shared.action_str == "d":
-            lower_line = shared.chars[lower_meniscus_y]
-            upper_line = shared.chars[upper_meniscus_y]
-
-        lines_to_delete = []
-        original_pos = (shared.visual_mode_axis.x, shared.visual_mode_axis.y)
-        copy_output = ""
-        for i, row in enumerate(range(lower_meniscus_y, upper_meniscus_y + 1)):
+        rows = []
+        for row in range(lower_meniscus_y, upper_meniscus_y + 1):
             size = 0
             offset = 0
 
@@ -241,64 +234,61 @@ class Cursor:
                 if size == 0:
                     size = 1
 
-            if shared.action_str == "d":
-                copy_output += "".join(shared.chars[row][offset : size + offset]) + "\n"
-                del shared.chars[row][offset : size + offset]
-                if not shared.chars[row]:
-                    lines_to_delete.append(row)
-                continue
-            row_size = size * shared.FONT_WIDTH
-            row_image = pygame.Surface((row_size, shared.FONT_HEIGHT), pygame.SRCALPHA)
-            row_image.fill(shared.theme["default-fg"])
-            row_image.set_alpha(50)
-
-            final_surf.blit(
-                row_image, (offset * shared.FONT_WIDTH, i * shared.FONT_HEIGHT)
-            )
+            rows.append((row, offset, size))
 
-        for line in lines_to_delete[::-1]:
-            shared.chars.pop(line)
-            # shared.cursor_pos.y = line
-            if not shared.chars:
-                shared.chars.append(CharList([]))
-
-        if shared.action_str == "d":
-            # Join the two half eaten lines
-            try:
-                if lower_meniscus_y == upper_meniscus_y:
-                    shared.chars[lower_meniscus_y] = lower_line
-                else:
-                    shared.chars[lower_meniscus_y] = lower_line + upper_line
-            except IndexError:
-                logger.info(f"{shared.cursor_pos = }")
-                logger.info(f"{len(shared.chars) = }; {lower_meniscus_y = };")
-
-            try:
-                shared.chars.pop(lower_meniscus_y + 1)
-            except IndexError:
-                pass
-            shared.cursor_pos = Pos(
-                shared.visual_mode_axis.x, shared.visual_mode_axis.y
-            )
+        return rows
 
-            # Copy the deleted content to the clipboard
-            shared.history.delete(copy_output, original_pos)
-            pygame.scrap.put_text(copy_output)
+    def delete_selection(self):
+        if shared.mode != FileState.VISUAL or shared.action_str != "d":
+            return
 
-        if shared.cursor_pos.y < shared.visual_mode_axis.y:
-            offset = 0
-        else:
-            offset = -final_surf.get_height() + shared.FONT_HEIGHT
+        rows = self.get_selected_rows()
+        first_row, first_offset, _ = rows[0]
+        last_row, last_offset, last_size = rows[-1]
+        selection_start = Pos(first_offset, first_row)
+        selection_end = Pos(last_offset + last_size, last_row)
 
-        posy = (shared.FONT_HEIGHT * shared.cursor_pos.y) + shared.scroll.y
-        editor_surf.blit(final_surf, (-shared.scroll.x, offset + posy))
+        deleted_text = shared.chars.delete(selection_start, selection_end)
+        shared.cursor_pos = selection_start
+
+        # Copy the deleted content to the clipboard
+        pygame.scrap.put_text(deleted_text + "\n")
         on_d()
 
+    def highlight_selected_text(self, editor_surf: pygame.Surface):
+        rows = self.get_selected_rows()
+        widest = max(size for _, _, size in rows) * shared.FONT_WIDTH
+        row_image = pygame.Surface(
+            (max(widest, 0), shared.FONT_HEIGHT), pygame.SRCALPHA
+        )
+        row_image.fill(shared.theme["default-fg"])
+        row_image.set_alpha(50)
+
+        for row, offset, size in rows:
+            pos = (
+                (offset * shared.FONT_WIDTH) - shared.scroll.x,
+                (row * shared.FONT_HEIGHT) + shared.scroll.y,
+            )
+            area = (0, 0, size * shared.FONT_WIDTH, shared.FONT_HEIGHT)
+            editor_surf.blit(row_image, pos, area)
+
+    def draw_cell(self, cell_surf: pygame.Surface):
+        cell_surf.blit(self.image, (0, 0))
+
+        try:
+            char = shared.chars[shared.cursor_pos.y][shared.cursor_pos.x]
+        except IndexError:
+            return
+        glyph = glyph_atlas.get(char, shared.theme["default-bg"])
+        if glyph is not None:
+            cell_surf.blit(glyph, (0, 0))
+
     def update(self):
         if shared.typing_cmd or shared.selecting_file:
             return
-        self.blink()
+        self.blink_timer.keep_alive()
         self.regex_manager.update()
+        self.delete_selection()
         if shared.autocompleting:
             return
         self.update_accels()
@@ -306,20 +296,33 @@ class Cursor:
         self.move()
         self.rect.topleft = self.pos
 
+    def get_damage_key(self) -> tuple:
+        try:
+            char = shared.chars[shared.cursor_pos.y][shared.cursor_pos.x]
+        except IndexError:
+            char = ""
+        hidden = shared.mode == FileState.INSERT and not self.cursor_visible
+        return hidden, char, shared.mode
+
     def draw(self, editor_surf: pygame.Surface):
         if shared.mode == FileState.INSERT and not self.cursor_visible:
             return
 
+        style = get_style_key()
         if shared.mode == FileState.VISUAL:
-            self.highlight_selected_text(editor_surf)
-        editor_surf.blit(self.image, self.pos)
+            self.selection_layer.update(
+                (
+                    style,
+                    shared.chars.version,
+                    shared.scroll.x,
+                    shared.scroll.y,
+                    shared.visual_mode_axis.x,
+                    shared.visual_mode_axis.y,
+                    shared.cursor_pos.x,
+                    shared.cursor_pos.y,
+                )
+            )
+            self.selection_layer.draw(editor_surf)
 
-        try:
-            char = shared.chars[shared.cursor_pos.y][shared.cursor_pos.x]
-        except IndexError:
-            return
-        try:
-            char_surf = shared.FONT.render(char, True, shared.theme["default-bg"])
-        except pygame.error:
-            return
-        editor_surf.blit(char_surf, self.pos)
+        self.cell_layer.update((style, self.get_damage_key()))
+        self.cell_layer.draw(editor_surf, self.pos)
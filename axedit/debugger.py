@@ -11,7 +11,8 @@ class Debugger:
 
     def update(self):
         fps_string = f"{shared.clock.get_fps():.0f}"
-        self.debug_info = fps_string
+        idle_string = f"{shared.idle_loop.idle_cpu_percent:.1f}% idle CPU"
+        self.debug_info = f"{fps_string} {idle_string}"
 
     def draw(self):
         debug_surf = shared.FONT.render(self.debug_info, True, "green")
@@ -0,0 +1,122 @@
+"""
+Files that are open in the editor.
+
+The active document lives in the `shared` globals the rest of the editor
+reads, such as `shared.chars`, `shared.file_name` and `shared.cursor_pos`.
+Every other open document keeps its buffer (and so its undo history),
+cursor and scroll, so switching back to it is instant. The heavier
+caches, highlighter colors and lints, are only kept for the most
+recently used documents.
+"""
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pygame
+
+from axedit import shared
+from axedit.buffer import TextBuffer
+from axedit.classes import Pos
+from axedit.funcs import sync_file
+from axedit.linter import LintCache
+from axedit.syntax_highlighting import ColorCache, get_color_cache, set_color_cache
+
+MAX_CACHED_DOCUMENTS = 3
+MAX_OPEN_DOCUMENTS = 16
+
+
+@dataclass(slots=True)
+class Document:
+    file_name: str
+    chars: TextBuffer
+    encoding: str
+    newline: str
+    cursor_pos: Pos
+    scroll: pygame.Vector2
+    saved: bool
+    signature: tuple[int, int, int] | None
+    color_cache: ColorCache | None
+    lint_cache: LintCache | None
+
+
+class DocumentManager:
+    def __init__(self) -> None:
+        # Least recently used first
+        self.documents: OrderedDict[str, Document] = OrderedDict()
+
+    def store_active(self) -> None:
+        """Takes the active document out of `shared` and keeps it"""
+
+        if shared.file_name is None or shared.naming_file:
+            return
+
+        # A renamed file is still the same document
+        for key, document in list(self.documents.items()):
+            if document.chars is shared.chars:
+                del self.documents[key]
+
+        file = os.path.realpath(shared.file_name)
+        watcher = shared.file_watcher
+        self.documents[file] = Document(
+            file_name=shared.file_name,
+            chars=shared.chars,
+            encoding=shared.file_encoding,
+            newline=shared.file_newline,
+            cursor_pos=Pos(shared.cursor_pos.x, shared.cursor_pos.y),
+            scroll=shared.scroll.copy(),
+            saved=shared.saved,
+            signature=watcher.signature if watcher.path == file else None,
+            color_cache=get_color_cache(),
+            lint_cache=shared.linter.get_lint_cache(),
+        )
+        self.trim()
+
+    def trim(self) -> None:
+        """Drops heavy caches, then whole saved documents, oldest first"""
+
+        documents = list(self.documents.items())
+        for _, document in documents[:-MAX_CACHED_DOCUMENTS]:
+            document.color_cache = None
+            document.lint_cache = None
+
+        excess = len(documents) - MAX_OPEN_DOCUMENTS
+        for key, document in documents:
+            if excess <= 0:
+                break
+            if document.saved:
+                del self.documents[key]
+                excess -= 1
+
+    def activate(self, file: str) -> bool:
+        """Makes an open document the active one, `False` if it is not open"""
+
+        document = self.documents.pop(os.path.realpath(file), None)
+        if document is None:
+            return False
+
+        shared.file_name = document.file_name
+        shared.chars = document.chars
+        shared.file_encoding = document.encoding
+        shared.file_newline = document.newline
+        shared.cursor_pos = document.cursor_pos
+        shared.scroll = document.scroll
+        shared.saved = document.saved
+        shared.chars_changed = True
+        # Changes made on disk while it was in the background get diffed in
+        shared.file_watcher.watch(document.file_name, document.signature)
+        set_color_cache(document.color_cache)
+        shared.linter.set_lint_cache(document.lint_cache)
+        return True
+
+    def open(self, file: str) -> None:
+        self.store_active()
+        if self.activate(file):
+            return
+
+        sync_file(file)
+        shared.cursor_pos = Pos(0, 0)
+        shared.scroll = pygame.Vector2()
+        shared.saved = True
+        set_color_cache(None)
+        shared.linter.set_lint_cache(None)
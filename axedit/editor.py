@@ -4,12 +4,16 @@ import pygame
 
 from axedit import shared
 from axedit.classes import Pos
-from axedit.funcs import get_text, is_event_frame, save_file
+from axedit.funcs import is_event_frame, save_file
 from axedit.input_queue import AcceleratedKeyPress, EventManager, InputManager
 from axedit.logs import logger
 from axedit.state_enums import FileState
-from axedit.syntax_highlighting import apply_syntax_highlighting
-from axedit.utils import Time
+from axedit.syntax_highlighting import (
+    apply_syntax_highlighting,
+    get_names_version,
+    index_in_background,
+)
+from axedit.timers import scheduler
 
 
 class WriteMode:
@@ -31,7 +35,7 @@ class WriteMode:
             pygame.K_BACKSPACE, self.delete_chars
         )
         self.accelerated_new_line = AcceleratedKeyPress(pygame.K_RETURN, self.new_line)
-        self.blink_timer = Time(0.5)
+        self.blink_timer = scheduler.create(0.5, self.on_typing_pause)
         self._typing = False
 
     def on_tab(self):
@@ -41,6 +45,7 @@ class WriteMode:
 
     def on_esc(self):
         shared.mode = FileState.NORMAL
+        shared.chars.history.seal()
         shared.action_queue.clear()
         shared.action_str = ""
         if shared.cursor_pos.x > 0:
@@ -53,38 +58,35 @@ class WriteMode:
     @typing.setter
     def typing(self, val):
         self._typing = val
-        self.blink_timer.reset()
+        self.blink_timer.start()
 
-    def blink_cursor(self):
-        if self.typing and self.blink_timer.tick():
-            self.typing = False
+    def on_typing_pause(self):
+        self._typing = False
 
+    def blink_cursor(self):
         if self.typing:
             shared.cursor.cursor_visible = True
 
     def on_write_char(self, event):
-        shared.history.insert(event.text, (shared.cursor_pos.x, shared.cursor_pos.y))
         self.write_char(event.text)
 
     def write_char(self, text):
-        for char in text:
-            self.get_line().insert(shared.cursor_pos.x, char)
-            shared.cursor_pos.x += 1
-
-        closing_bracket = WriteMode.BRACKET_MATCHERS.get(text)
-        if closing_bracket is not None:
-            self.get_line().insert(shared.cursor_pos.x, closing_bracket)
-
+        char = text[-1]
+        closing = WriteMode.BRACKET_MATCHERS.get(text, "")
         if char in "\"'":
-            self.get_line().insert(shared.cursor_pos.x, char)
+            closing = char
+
+        # The text and its closing pair go in as one edit
+        end = shared.chars.insert(shared.cursor_pos, text + closing)
+        shared.cursor_pos = Pos(end.x - len(closing), end.y)
         self.typing = True
         shared.text_writing = True
         shared.saved = False
 
-    def get_indentation_after_colon(self, line: list[str]) -> list[str]:
+    def get_indentation_after_colon(self, line: str) -> str:
         count = 0
 
-        str_line = "".join(line).strip()
+        str_line = line.strip()
         if str_line and str_line[-1] == ":":
             count = 4  # Starts off as 4 since we are adding a level of indendation
         for char in line:
@@ -92,34 +94,24 @@ class WriteMode:
                 break
             count += 1
 
-        return [" "] * count
+        return " " * count
 
     def new_line(self):
         if hasattr(shared, "autocompletion") and shared.autocompletion.completions:
             return
 
-        line = self.get_line()
-
-        # Pre line
-        pre = line[: shared.cursor_pos.x]
-        shared.chars[shared.cursor_pos.y] = pre
+        indentation = self.get_indentation_after_colon(self.get_line())
+        shared.chars.insert(shared.cursor_pos, "\n" + indentation)
 
-        # Update y pos
         shared.cursor_pos.y += 1
-
-        # Post line
-        post = self.get_indentation_after_colon(line) + line[shared.cursor_pos.x :]
-        shared.chars.insert(shared.cursor_pos.y, post)
-
-        # Update x pos
         shared.cursor_pos.x = 0
-        # shared.cursor_pos.x = len(post)
+        # shared.cursor_pos.x = len(indentation)
 
         # Cleanup
         self.typing = True
         shared.saved = False
 
-    def get_line(self):
+    def get_line(self) -> str:
         return shared.chars[shared.cursor_pos.y]
 
     def delete_chars(self):
@@ -127,18 +119,20 @@ class WriteMode:
         if shared.cursor_pos.x == 0:
             if shared.cursor_pos.y == 0:
                 return
-            before_extension = len(shared.chars[shared.cursor_pos.y - 1])
-            shared.chars[shared.cursor_pos.y - 1].extend(
-                shared.chars[shared.cursor_pos.y]
+            prev_line_end = Pos(
+                len(shared.chars[shared.cursor_pos.y - 1]), shared.cursor_pos.y - 1
             )
-            self.go_prev_line()
-            shared.cursor_pos.x = before_extension
+            shared.chars.delete(prev_line_end, shared.cursor_pos)
+            shared.cursor_pos = prev_line_end
             return
 
-        line = "".join(self.get_line())
+        line = self.get_line()
         if line and not line.strip():
             amount = len(line) % 4 or 4
-            del shared.chars[shared.cursor_pos.y][-amount:]
+            shared.chars.delete(
+                Pos(len(line) - amount, shared.cursor_pos.y),
+                Pos(len(line), shared.cursor_pos.y),
+            )
             shared.cursor_pos.x -= amount
             return
 
@@ -146,15 +140,11 @@ class WriteMode:
         self.typing = True
 
         shared.cursor_pos.x -= 1
-        try:
-            self.get_line().pop(shared.cursor_pos.x)
-        except IndexError:
+        if shared.cursor_pos.x >= len(line):
             return
-
-    def go_prev_line(self):
-        shared.chars.pop(shared.cursor_pos.y)
-        shared.cursor_pos.y -= 1
-        shared.cursor_pos.x = len(self.get_line())
+        shared.chars.delete(
+            shared.cursor_pos, Pos(shared.cursor_pos.x + 1, shared.cursor_pos.y)
+        )
 
     def handle_input(self):
         shared.text_writing = False
@@ -178,7 +168,7 @@ class NormalMode:
         self.event_manager = EventManager({pygame.TEXTINPUT: self.register_number})
         shared.naming_file = False
         self.mini_curs = cycle(("|", "_"))
-        self.mini_timer = Time(0.5)
+        self.mini_timer = scheduler.every(0.5, self.on_mini_blink, lease=True)
         self.mini_cur = "_"
 
         self.registering_number = False
@@ -216,13 +206,17 @@ class NormalMode:
         shared.action_queue.clear()
         shared.action_str = ""
 
+    def on_mini_blink(self):
+        if not shared.naming_file:
+            return
+        self.mini_cur = next(self.mini_curs)
+        shared.file_name = shared.file_name[:-1] + self.mini_cur
+
     def name_file(self):
         if not shared.naming_file:
             return
 
-        if self.mini_timer.tick():
-            self.mini_cur = next(self.mini_curs)
-            shared.file_name = shared.file_name[:-1] + self.mini_cur
+        self.mini_timer.keep_alive()
 
         for event in shared.events:
             if event.type == pygame.TEXTINPUT:
@@ -274,11 +268,7 @@ class VisualMode:
 
 class Editor:
     def __init__(self) -> None:
-        self.surf = pygame.Surface(
-            (shared.srect.width, len(shared.chars) * shared.FONT_HEIGHT),
-            pygame.SRCALPHA,
-        )
-        shared.scroll = pygame.Vector2()
+        self.surf = pygame.Surface(shared.srect.size, pygame.SRCALPHA)
         self.gen_image()
 
         self.input_handlers = {
@@ -302,13 +292,8 @@ class Editor:
                 shared.scrolling = True
 
     def gen_image(self):
-        if shared.file_name is not None and shared.file_name.endswith(".py"):
-            self.image = apply_syntax_highlighting()
-        else:
-            text = get_text()
-            if text.strip() == "":
-                text = ""
-            self.image = shared.FONT.render(text, True, shared.theme["default-fg"])
+        # Only the rows on screen are rendered, whatever the file type
+        self.image = apply_syntax_highlighting()
 
     def handle_select_input(self): ...
 
@@ -395,7 +380,12 @@ class Editor:
     def on_ctrl_z(self):
         if not (shared.keys[pygame.K_LCTRL] and shared.kp[pygame.K_z]):
             return
-        shared.history.undo()
+        shared.chars.history.undo()
+
+    def on_ctrl_y(self):
+        if not (shared.keys[pygame.K_LCTRL] and shared.kp[pygame.K_y]):
+            return
+        shared.chars.history.redo()
 
     def update(self):
         if shared.typing_cmd:
@@ -406,6 +396,8 @@ class Editor:
         self.handle_input()
         self.on_drag()
         self.on_ctrl_z()
+        self.on_ctrl_y()
+        index_in_background()
         if (
             hasattr(shared, "autocompletion")
             and shared.file_name is not None
@@ -414,19 +406,48 @@ class Editor:
             shared.autocompletion.update()
             shared.linter.update()
 
+    def get_damage_key(self) -> tuple:
+        """Everything the text area shows besides the cursor"""
+
+        key = (
+            shared.file_name,
+            shared.chars.version,
+            shared.scroll.x,
+            shared.scroll.y,
+            shared.mode,
+            get_names_version(),
+        )
+        if shared.mode == FileState.VISUAL:
+            key += (
+                shared.visual_mode_axis.x,
+                shared.visual_mode_axis.y,
+                shared.cursor_pos.x,
+                shared.cursor_pos.y,
+            )
+        if hasattr(shared, "autocompletion"):
+            key += (
+                shared.autocompletion.get_damage_key(),
+                shared.linter.get_damage_key(),
+            )
+        return key
+
     def draw(self):
+        """Draws the text and everything over it in one pass"""
+
         self.gen_image()
-        self.surf = pygame.Surface(
-            shared.srect.size,
-            pygame.SRCALPHA,
-        )
+        if self.surf.get_size() != shared.srect.size:
+            self.surf = pygame.Surface(shared.srect.size, pygame.SRCALPHA)
+        self.surf.fill((0, 0, 0, 0))
 
         is_python_file = shared.file_name is not None and shared.file_name.endswith(
             ".py"
         )
-        self.surf.blit(
-            self.image, (-shared.scroll.x, (not is_python_file) * shared.scroll.y)
-        )
-        if hasattr(shared, "autocompletion") and is_python_file:
-            shared.autocompletion.draw(self.surf)
+        self.surf.blit(self.image, (0, 0))
+
+        has_tooling = hasattr(shared, "autocompletion") and is_python_file
+        if has_tooling:
             shared.linter.draw(self.surf)
+        shared.cursor.draw(self.surf)
+        # Suggestions pop up over the cursor
+        if has_tooling:
+            shared.autocompletion.draw(self.surf)
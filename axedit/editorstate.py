@@ -1,19 +1,23 @@
-import os
+import locale
 
 import pygame
 
 from axedit import shared
-from axedit.classes import CharList, Pos
+from axedit.buffer import TextBuffer
+from axedit.classes import Pos
+from axedit.compositor import compositor
 from axedit.cursor import Cursor
+from axedit.documents import DocumentManager
 from axedit.editor import Editor
 from axedit.file_selector import FileSelector
+from axedit.file_watcher import FileWatcher
 from axedit.funcs import (
     get_text,
     offset_font_size,
+    reload_file,
     save_file,
     set_windows_title,
     soft_save_file,
-    sync_file,
 )
 from axedit.line_numbers import LineNumbers
 from axedit.logs import logger
@@ -22,7 +26,12 @@ from axedit.state_enums import FileState, State
 from axedit.status_bar import StatusBar
 from axedit.utils import render_at
 
-shared.chars = CharList([CharList([])])
+shared.chars = TextBuffer()
+shared.cursor_pos = Pos(0, 0)
+shared.scroll = pygame.Vector2()
+shared.saved = True
+shared.file_watcher = FileWatcher()
+shared.documents = DocumentManager()
 
 
 class EditorState:
@@ -34,7 +43,6 @@ class EditorState:
         self.status_bar = StatusBar()
         self.offset = 4
         self.scrollbar = HorizontalScrollBar()
-        self.last_file_time = 0
         self.file_selector: None | FileSelector = None
         self.reset_xy()
 
@@ -45,9 +53,6 @@ class EditorState:
     def shared_reset(self):
         shared.chars_changed = True
         shared.action_str = ""
-        shared.cursor_pos = Pos(0, 0)
-        shared.saved = True
-        shared.import_line_changed = True
         shared.cursor = Cursor()
         shared.action_queue.clear()
         shared.visual_mode_axis = Pos(0, 0)
@@ -70,8 +75,14 @@ class EditorState:
 
         for event in shared.events:
             if event.type == pygame.KEYDOWN and event.key == pygame.K_n:
+                shared.documents.store_active()
                 shared.file_name = None
-                shared.chars = CharList([[""]])
+                shared.file_encoding = locale.getpreferredencoding(False)
+                shared.file_newline = "\n"
+                shared.chars = TextBuffer()
+                shared.cursor_pos = Pos(0, 0)
+                shared.scroll = pygame.Vector2()
+                shared.saved = True
                 self.next_state = State.EDITOR
                 set_windows_title()
 
@@ -113,11 +124,11 @@ class EditorState:
         shared.action_str = "".join(shared.action_queue)
 
     def on_local_file_change(self):
-        if shared.naming_file or shared.file_name is None:
+        if shared.naming_file:
             return
-        if os.stat(shared.file_name).st_mtime != self.last_file_time:
-            sync_file(shared.file_name)
-        self.last_file_time = os.stat(shared.file_name).st_mtime
+        shared.file_watcher.watch(shared.file_name)
+        if shared.file_watcher.poll():
+            reload_file(shared.file_name)
 
     def update(self):
         if shared.selecting_file and self.file_selector is None:
@@ -127,12 +138,11 @@ class EditorState:
 
         if self.next_state is not None:
             return
-        shared.import_line_changed = False
         shared.chars_changed = False
+        shared.chars.clear_frame_events()
         shared.actions_modified = False
         shared.font_offset = False
         self.on_local_file_change()
-        self.char_handler()
         self.queue_actions()
         self.on_ctrl_p()
         self.on_ctrl_n()
@@ -156,11 +166,6 @@ class EditorState:
             if self.next_state is not None:
                 shared.frame_cache.clear()
 
-    def char_handler(self):
-        for i, lst in enumerate(shared.chars):
-            if not isinstance(lst, CharList):
-                shared.chars[i] = CharList(lst)
-
     def draw_all(self):
         line_width, line_height = self.line_numbers.surf.get_size()
         editor_width, editor_height = self.editor.surf.get_size()
@@ -185,11 +190,43 @@ class EditorState:
             "bottomleft",
         )
 
+    def report_damage(self):
+        line_width = self.line_numbers.surf.get_width()
+        compositor.show(
+            "line_numbers",
+            (
+                self.line_numbers.last_scroll_offset,
+                self.line_numbers.last_char_pos_y,
+                self.line_numbers.last_chars_length,
+            ),
+            self.line_numbers.surf.get_rect(),
+        )
+        compositor.show(
+            "editor",
+            self.editor.get_damage_key(),
+            self.editor.surf.get_rect(topleft=(line_width, 0)),
+        )
+        compositor.show(
+            "cursor",
+            shared.cursor.get_damage_key(),
+            shared.cursor.rect.move(line_width, 0),
+        )
+
+        status_rect = self.status_bar.surf.get_rect(bottomleft=shared.srect.bottomleft)
+        compositor.show(
+            "status_bar",
+            (shared.mode, shared.file_name, shared.saved, shared.action_str),
+            status_rect,
+        )
+        if shared.typing_cmd:
+            # The command bar blinks and animates its suggestions
+            compositor.damage(status_rect)
+
+        if self.file_selector is not None:
+            compositor.damage_all()
+
     def draw(self):
         self.editor.draw()
-        shared.cursor.draw(self.editor.surf)
-        if shared.chars_changed:
-            self.editor.draw()
         self.line_numbers.draw()
         self.status_bar.draw()
         self.scrollbar.draw()
@@ -197,3 +234,4 @@ class EditorState:
 
         if self.file_selector is not None:
             self.file_selector.draw()
+        self.report_damage()
@@ -9,7 +9,8 @@ from axedit.funcs import get_config_path, is_event_frame, open_file, set_windows
 from axedit.input_queue import AcceleratedKeyPress
 from axedit.logs import logger
 from axedit.state_enums import State
-from axedit.utils import Time, highlight_text, render_at
+from axedit.timers import scheduler
+from axedit.utils import highlight_text, render_at
 
 
 class Preview:
@@ -32,10 +33,10 @@ class Preview:
             2,
         )
 
-    def get_lines(self, file: str | Path) -> list[str]:
+    def get_lines(self, file: str | Path, n_lines: int) -> list[str]:
         try:
             with open(file) as f:
-                return f.readlines()
+                return list(itertools.islice(f, n_lines))
         except UnicodeDecodeError as e:
             return ["THIS FILE FORMAT IS NOT SUPPORTED BY THE EDITOR"]
 
@@ -48,10 +49,10 @@ class Preview:
             self.gen_blank()
             return
 
-        lines = self.get_lines(file)
+        lines = self.get_lines(file, n_lines)
 
         self.gen_blank()
-        for y, line in enumerate(lines[:n_lines]):
+        for y, line in enumerate(lines):
             surf = shared.FONT.render(line, True, shared.theme["default-fg"])
             self.surf.blit(
                 surf, (self.padding, y * shared.FONT_HEIGHT, *surf.get_size())
@@ -95,7 +96,7 @@ class SearchBar:
         self.text = ""
         self.cursors = itertools.cycle(("", SearchBar.BAR))
         self.cursor = next(self.cursors)
-        self.blink_timer = Time(0.7)
+        self.blink_timer = scheduler.every(0.7, self.on_blink, lease=True)
 
         self.accel = AcceleratedKeyPress(pygame.K_BACKSPACE, self.on_delete)
         self.start_filtering = False
@@ -107,7 +108,7 @@ class SearchBar:
 
     def on_delete(self):
         self.text = self.text[:-1]
-        self.blink_timer.reset()
+        self.blink_timer.start()
         self.cursor = SearchBar.BAR
 
         if self.text:
@@ -119,7 +120,7 @@ class SearchBar:
 
     def on_enter(self, event):
         self.text += event.text
-        self.blink_timer.reset()
+        self.blink_timer.start()
         self.cursor = SearchBar.BAR
         UI.file_tree.matches = []
         UI.file_tree.seq = Path(".").rglob("*")
@@ -134,8 +135,10 @@ class SearchBar:
             if event.type == pygame.TEXTINPUT:
                 self.on_enter(event)
 
-        if self.blink_timer.tick():
-            self.cursor = next(self.cursors)
+        self.blink_timer.keep_alive()
+
+    def on_blink(self):
+        self.cursor = next(self.cursors)
 
     def draw(self):
         self.gen_blank()
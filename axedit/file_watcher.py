@@ -0,0 +1,250 @@
+"""
+Notices when the open file is changed by another program.
+
+On Linux an inotify watch on the file's directory wakes a background
+thread, anything else falls back to a throttled `os.stat`. Either way a
+change only counts if the file's stat signature differs from the last
+one seen, so the editor's own saves are not reported.
+"""
+
+import ctypes
+import ctypes.util
+import difflib
+import os
+import platform
+import struct
+import threading
+from bisect import bisect_left
+from collections import Counter
+
+from axedit import shared
+from axedit.idle import wake_up
+from axedit.logs import logger
+from axedit.timers import scheduler
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_EVENT_HEADER = struct.Struct("iIII")
+# Size past which a run of changed lines is replaced whole instead of diffed,
+# in old times new lines, as diffing a run grows with their product
+MAX_DIFF_CELLS = 1_000_000
+
+
+class _Inotify:
+    """Minimal ctypes binding for watching a single directory"""
+
+    MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+
+    def __init__(self) -> None:
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.wd: int | None = None
+
+    def watch(self, directory: str) -> None:
+        if self.wd is not None:
+            self.libc.inotify_rm_watch(self.fd, self.wd)
+        self.wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), self.MASK
+        )
+
+    def read_names(self) -> list[str]:
+        """Blocks until events arrive, returns the file names they are about"""
+
+        data = os.read(self.fd, 64 * 1024)
+        names = []
+        offset = 0
+        while offset < len(data):
+            wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if wd == self.wd:
+                names.append(os.fsdecode(name))
+
+        return names
+
+
+class FileWatcher:
+    STAT_INTERVAL = 0.5
+
+    def __init__(self) -> None:
+        self.path: str | None = None
+        self.signature: tuple[int, int, int] | None = None
+        self.notified = threading.Event()
+        self.inotify: _Inotify | None = None
+
+        if platform.system() == "Linux":
+            try:
+                self.inotify = _Inotify()
+            except (OSError, AttributeError) as e:
+                logger.warning(f"inotify unavailable, polling instead: {e}")
+        if self.inotify is not None:
+            threading.Thread(target=self.threaded_watch, daemon=True).start()
+        else:
+            self.stat_timer = scheduler.every(self.STAT_INTERVAL, self.notified.set)
+
+    def threaded_watch(self) -> None:
+        while True:
+            try:
+                names = self.inotify.read_names()
+            except OSError:
+                return
+
+            if self.path is not None and os.path.basename(self.path) in names:
+                self.notified.set()
+                wake_up()
+
+    def get_signature(self) -> tuple[int, int, int] | None:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def watch(
+        self, path: str | None, signature: tuple[int, int, int] | None = None
+    ) -> None:
+        """
+        Switches to watching `path`. A known `signature` from earlier
+        makes changes made since then show up on the next poll.
+        """
+
+        if path is not None:
+            path = os.path.realpath(path)
+        if path == self.path:
+            return
+
+        self.path = path
+        if path is None:
+            return
+
+        self.signature = signature or self.get_signature()
+        self.notified.set()
+        if self.inotify is not None:
+            self.inotify.watch(os.path.dirname(path))
+
+    def acknowledge(self) -> None:
+        """Treats the file as it is on disk right now as already seen"""
+
+        if self.path is not None:
+            self.signature = self.get_signature()
+
+    def poll(self) -> bool:
+        """Whether the file changed on disk since the last poll"""
+
+        if self.path is None:
+            return False
+
+        if not self.notified.is_set():
+            return False
+        self.notified.clear()
+
+        signature = self.get_signature()
+        if signature is None or signature == self.signature:
+            return False
+
+        self.signature = signature
+        return True
+
+
+def diff_lines(
+    old_lines: list[str], new_lines: list[str]
+) -> list[tuple[str, int, int, int, int]]:
+    """
+    `SequenceMatcher` style opcodes turning `old_lines` into `new_lines`,
+    without the `equal` ones
+    """
+
+    # The lines both versions start and end with are left out
+    prefix = 0
+    shortest = min(len(old_lines), len(new_lines))
+    while prefix < shortest and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while (
+        suffix < shortest - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]
+    ):
+        suffix += 1
+    old_end, new_end = len(old_lines) - suffix, len(new_lines) - suffix
+
+    # Lines found exactly once in both versions are matched up first, in
+    # order, so only the short runs between them are left to the matcher
+    old_counts = Counter(old_lines[prefix:old_end])
+    new_counts = Counter(new_lines[prefix:new_end])
+    new_positions = {
+        new_lines[j]: j for j in range(prefix, new_end) if new_counts[new_lines[j]] == 1
+    }
+    pairs = [
+        (i, new_positions[old_lines[i]])
+        for i in range(prefix, old_end)
+        if old_counts[old_lines[i]] == 1 and old_lines[i] in new_positions
+    ]
+    anchors = _longest_increasing_run(pairs)
+
+    hunks = []
+    i = j = prefix
+    for anchor_i, anchor_j in [*anchors, (old_end, new_end)]:
+        if (anchor_i - i) * (anchor_j - j) > MAX_DIFF_CELLS:
+            hunks.append(("replace", i, anchor_i, j, anchor_j))
+        elif anchor_i > i or anchor_j > j:
+            matcher = difflib.SequenceMatcher(
+                None, old_lines[i:anchor_i], new_lines[j:anchor_j]
+            )
+            hunks.extend(
+                (tag, i1 + i, i2 + i, j1 + j, j2 + j)
+                for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+                if tag != "equal"
+            )
+        i, j = anchor_i + 1, anchor_j + 1
+
+    return hunks
+
+
+def _longest_increasing_run(pairs: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """The longest run of `pairs` that increases in both coordinates"""
+
+    # Patience sorting, `tails[k]` ends the best run of length `k + 1`
+    tails: list[int] = []
+    tail_js: list[int] = []
+    previous: list[int] = []
+    for index, (_, j) in enumerate(pairs):
+        k = bisect_left(tail_js, j)
+        previous.append(tails[k - 1] if k else -1)
+        if k == len(tails):
+            tails.append(index)
+            tail_js.append(j)
+        else:
+            tails[k] = index
+            tail_js[k] = j
+
+    run = []
+    index = tails[-1] if tails else -1
+    while index != -1:
+        run.append(pairs[index])
+        index = previous[index]
+    return run[::-1]
+
+
+def apply_line_diff(new_lines: list[str]) -> None:
+    """Edits the buffer into `new_lines`, touching only the changed hunks"""
+
+    old_lines = shared.chars[:]
+    if old_lines == new_lines:
+        return
+
+    hunks = diff_lines(old_lines, new_lines)
+
+    shared.chars.apply_line_edits(
+        [(i1, i2, new_lines[j1:j2]) for _, i1, i2, j1, j2 in hunks]
+    )
+    # Every hunk is compared against the line the cursor was on before any
+    shared.cursor_pos.y += sum(
+        (j2 - j1) - (i2 - i1)
+        for _, i1, i2, j1, j2 in hunks
+        if i2 <= shared.cursor_pos.y
+    )
+
+    shared.cursor_pos.y = min(max(shared.cursor_pos.y, 0), len(shared.chars) - 1)
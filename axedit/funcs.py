@@ -1,8 +1,14 @@
+import codecs
+import contextlib
+import locale
 import logging
 import os
 import platform
 import shlex
+import shutil
 import subprocess
+import tempfile
+import time
 import typing as t
 from pathlib import Path
 
@@ -10,7 +16,10 @@ import pygame
 import tomlkit
 
 from axedit import shared
-from axedit.classes import CharList, Pos
+from axedit.buffer import TextBuffer, split_lines
+from axedit.classes import Pos
+from axedit.file_watcher import apply_line_diff
+from axedit.mapped_lines import is_mappable_encoding
 
 logger = logging.getLogger("axedit")
 
@@ -57,29 +66,118 @@ def safe_close_connections() -> None:
         shared.linter.close_connections()
 
 
+def get_large_file_threshold() -> int:
+    """Size in bytes above which files are memory mapped instead of read"""
+
+    large_files = shared.config.get("large_files", {})
+    return int(large_files.get("threshold_mb", 32) * 1024 * 1024)
+
+
+def sniff_file_format(file: str) -> tuple[str, str]:
+    """Encoding and line ending of a file, judged from its first chunk"""
+
+    with open(file, "rb") as f:
+        head = f.read(1 << 16)
+
+    encoding = locale.getpreferredencoding(False)
+    if head.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+    newline = "\r\n" if b"\r\n" in head else "\n"
+
+    return encoding, newline
+
+
 def sync_file(file: str) -> None:
-    with open(file) as f:
-        content = f.readlines()
+    encoding, newline = sniff_file_format(file)
+    if os.path.getsize(file) > get_large_file_threshold() and is_mappable_encoding(
+        encoding
+    ):
+        logger.info(f"Memory mapping large file {file}")
+        chars = TextBuffer.from_mapped_file(file, encoding)
+    else:
+        with open(file, encoding=encoding) as f:
+            content = f.read()
+        chars = TextBuffer.from_text(content)
     shared.file_name = file
-    shared.chars = CharList([list(line[:-1]) for line in content])
-    if not shared.chars:
-        shared.chars.append([])
+    shared.file_encoding = encoding
+    shared.file_newline = newline
+    shared.chars = chars
+
+    if shared.editing_config_file:
+        shared.config = get_config()
+
+
+def reload_file(file: str) -> None:
+    """Brings the buffer up to date with the file, editing only what changed"""
+
+    if shared.chars.mapped or os.path.getsize(file) > get_large_file_threshold():
+        sync_file(file)
+        return
+
+    encoding, newline = sniff_file_format(file)
+    with open(file, encoding=encoding) as f:
+        content = f.read()
+    shared.file_encoding = encoding
+    shared.file_newline = newline
+    apply_line_diff(split_lines(content))
 
     if shared.editing_config_file:
         shared.config = get_config()
 
 
 def open_file(file: str) -> None:
-    sync_file(file)
-    shared.cursor_pos = Pos(0, 0)
+    shared.documents.open(file)
+
+
+def write_file(file: str, lines: t.Iterable[str], encoding: str, newline: str) -> None:
+    """
+    Streams lines into a temporary file next to `file` and renames it over
+    `file`, so a failed save never leaves a truncated or missing file
+    """
+
+    file = os.path.realpath(file)
+    start = time.perf_counter()
+    fd, temp_file = tempfile.mkstemp(
+        prefix=f".{os.path.basename(file)}.", suffix=".tmp", dir=os.path.dirname(file)
+    )
+    try:
+        with open(fd, "w", encoding=encoding, newline=newline) as f:
+            f.writelines(line + "\n" for line in lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if os.path.exists(file):
+            shutil.copymode(file, temp_file)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_file, 0o666 & ~umask)
+
+        try:
+            os.replace(temp_file, file)
+        except PermissionError:
+            # Windows refuses to replace a file that is still memory mapped
+            if not shared.chars.mapped:
+                raise
+            shared.chars.unmap()
+            os.replace(temp_file, file)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_file)
+        raise
+
+    logger.info(f"Saved {file} in {(time.perf_counter() - start) * 1000:.1f}ms")
 
 
 def soft_save_file():
     shared.saved = True
     if shared.file_name is None:
         return
-    with open(shared.file_name, "w") as f:
-        f.write(get_text())
+    write_file(
+        shared.file_name, shared.chars, shared.file_encoding, shared.file_newline
+    )
+    if hasattr(shared, "file_watcher"):
+        shared.file_watcher.acknowledge()
 
     if not shared.file_name.endswith(".py"):
         return
@@ -95,9 +193,6 @@ def soft_save_file():
 def save_file():
     if shared.file_name is None:
         return
-    file = Path(shared.file_name)
-    if file.exists():
-        os.remove(file)
     soft_save_file()
 
 
@@ -203,9 +298,19 @@ def is_event_frame(event_type: int) -> bool:
     return False
 
 
-@cache_by_frame
-def get_text():
-    text = ""
-    for row in shared.chars:
-        text += "".join(row) + "\n"
-    return text
+def get_versioned_text() -> tuple[int, str]:
+    return shared.chars.get_versioned_text()
+
+
+def get_text() -> str:
+    return get_versioned_text()[1]
+
+
+def get_versioned_json_text() -> tuple[int, str]:
+    """`get_versioned_text()` encoded as a JSON string, for both servers"""
+
+    return shared.chars.get_versioned_json_text()
+
+
+def get_json_text() -> str:
+    return get_versioned_json_text()[1]
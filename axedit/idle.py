@@ -0,0 +1,127 @@
+"""
+Lets the main loop sleep while the editor has nothing to do.
+
+Frames run at the full rate while typing, scrolling or animating. Once
+that stops, the loop blocks in `pygame.event.wait` until the next event
+or the next deadline in the timer scheduler, such as a cursor blink.
+Background threads with something new to show, like lints or
+completions, call `wake_up` so it is drawn right away.
+"""
+
+import time
+
+import pygame
+
+from axedit import shared
+from axedit.timers import scheduler
+
+WAKE_UP = pygame.event.custom_type()
+# Seconds frames keep running at the full rate after the last activity
+ACTIVE_PERIOD = 0.5
+# Longest idle wait, a safety net for background work that does not wake us
+MAX_IDLE_WAIT = 0.5
+# How often background threads check for work
+BACKGROUND_POLL_INTERVAL = 0.01
+METER_PERIOD = 1.0
+
+
+def wake_up() -> None:
+    """Ends an idle wait early, safe to call from any thread"""
+
+    try:
+        pygame.event.post(pygame.Event(WAKE_UP))
+    except pygame.error:
+        # The display is not up yet, or already gone
+        pass
+
+
+class IdleLoop:
+    def __init__(self, fps: float) -> None:
+        self.fps = fps
+        self.last_active = time.perf_counter()
+        self.idle = False
+        # Held keys repeat, so they keep the loop running at the full rate
+        self.held_keys: set[int] = set()
+
+        # CPU time used by the whole process, as a percentage of one core
+        self.cpu_percent = 0.0
+        self.idle_cpu_percent = 0.0
+        self.meter_start = time.perf_counter()
+        self.frame_start = (time.perf_counter(), time.process_time())
+        self.busy_times = [0.0, 0.0]
+        self.idle_times = [0.0, 0.0]
+
+    def get_timeout(self) -> float:
+        """Seconds until something is due without any input"""
+
+        timeout = MAX_IDLE_WAIT
+        deadline = scheduler.next_deadline()
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.perf_counter())
+        return max(timeout, 0)
+
+    def wait(self) -> list[pygame.event.Event]:
+        """
+        Paces the next frame, sleeping until there is work if the editor
+        is idle. Returns the events taken off the queue while waiting.
+        """
+
+        self.idle = time.perf_counter() - self.last_active > ACTIVE_PERIOD
+        if not self.idle:
+            shared.dt = shared.clock.tick(self.fps) / 1000
+            return []
+
+        # A millisecond late so the timer that is due has surely passed
+        timeout_ms = int(self.get_timeout() * 1000) + 1
+        event = pygame.event.wait(timeout_ms)
+        shared.dt = shared.clock.tick() / 1000
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event]
+
+    def track_held_keys(self) -> None:
+        for event in shared.events:
+            if event.type == pygame.KEYDOWN:
+                self.held_keys.add(event.key)
+            elif event.type == pygame.KEYUP:
+                self.held_keys.discard(event.key)
+            elif event.type == pygame.WINDOWFOCUSLOST:
+                self.held_keys.clear()
+
+    def is_active(self) -> bool:
+        self.track_held_keys()
+        if any(event.type != WAKE_UP for event in shared.events):
+            return True
+
+        return (
+            bool(self.held_keys)
+            or any(shared.mouse_press)
+            or shared.chars_changed
+            or shared.scrolling
+            or shared.animating
+            or shared.typing_cmd
+            or shared.selecting_file
+        )
+
+    def end_frame(self) -> None:
+        """Notes whether this frame was busy, and measures CPU usage"""
+
+        if self.is_active():
+            self.last_active = time.perf_counter()
+
+        now, cpu = time.perf_counter(), time.process_time()
+        times = self.idle_times if self.idle else self.busy_times
+        times[0] += now - self.frame_start[0]
+        times[1] += cpu - self.frame_start[1]
+        self.frame_start = now, cpu
+
+        if now - self.meter_start < METER_PERIOD:
+            return
+
+        wall = self.idle_times[0] + self.busy_times[0]
+        self.cpu_percent = 100 * (self.idle_times[1] + self.busy_times[1]) / wall
+        if self.idle_times[0] > 0:
+            self.idle_cpu_percent = 100 * self.idle_times[1] / self.idle_times[0]
+        self.meter_start = now
+        self.busy_times = [0.0, 0.0]
+        self.idle_times = [0.0, 0.0]
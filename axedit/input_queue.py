@@ -1,71 +1,213 @@
-import enum
+from __future__ import annotations
+
 import re
 import typing as t
+from collections import deque
+from contextlib import contextmanager
 from dataclasses import dataclass
 
 from axedit import shared
-from axedit.classes import CharList
-from axedit.utils import Time
+from axedit.classes import Pos
+from axedit.state_enums import FileState
+from axedit.timers import scheduler
+
+if t.TYPE_CHECKING:
+    from axedit.buffer import EditEvent, TextBuffer
 
 
-class Action(enum.Enum):
-    INSERT = enum.auto()
-    DELETE = enum.auto()
+DEFAULT_HISTORY_MEMORY_MB = 64
+# Rough cost of a history element besides its lines
+HISTORY_ELEMENT_OVERHEAD = 64
 
 
-@dataclass(slots=True, frozen=True)
+@dataclass(slots=True)
 class HistoryElement:
-    text: str
-    pos: tuple[int, int]
-    action: Action
+    """Lines `y` to `y + line_count` used to be `lines`"""
+
+    y: int
+    lines: list[str]
+    line_count: int
+    cursor: Pos
+    size: int = 0
+
+    def __post_init__(self) -> None:
+        self.size = HISTORY_ELEMENT_OVERHEAD + sum(len(line) + 1 for line in self.lines)
+
+
+@dataclass(slots=True)
+class HistoryGroup:
+    """Steps undone together, in the order they were made"""
+
+    elements: list[HistoryElement]
+    size: int = 0
+
+    def __post_init__(self) -> None:
+        self.size = sum(element.size for element in self.elements)
+
+
+HistoryStep: t.TypeAlias = HistoryElement | HistoryGroup
 
 
 class HistoryManager:
-    """Manages the file history"""
-
-    def __init__(self) -> None:
-        self.history: list[HistoryElement] = []
-
-    def insert(self, text: str, pos: tuple[int, int]):
-        self.history.append(HistoryElement(text, pos, Action.INSERT))
-
-    def delete(self, text: str, pos: tuple[int, int]):
-        self.history.append(HistoryElement(text, pos, Action.DELETE))
-
-    def _undo_insert(self, element: HistoryElement):
-        pass
-
-    def _undo_delete(self, element: HistoryElement):
-        carried_over = ""
-        lines = element.text.splitlines()
-        for i, line in enumerate(map(CharList, lines)):
-            if carried_over:
-                line.extend(carried_over)
-            y = element.pos[1] + i
-            x = 0 if i else element.pos[0]
-            try:
-                shared.chars[y][x:x] = line
-            except IndexError:
-                shared.chars.append(line)
-            carried_over = "".join(shared.chars[y][x + len(line) - len(carried_over) :])
-            if 0 < i < len(lines) - 1:
-                del shared.chars[y][x + len(line) - len(carried_over) :]
-            if i == 0:
-                del shared.chars[y][x + len(line) :]
-
-        shared.cursor_pos.x = len(line) + x - len(carried_over)
-        shared.cursor_pos.y = y
+    """
+    Undo and redo for a `TextBuffer`.
+
+    Every step stores only the lines an edit replaced, so undoing it is one
+    line splice however big it was. Touching edits made in insert mode are
+    coalesced into a single step until it is sealed.
+    """
+
+    def __init__(self, buffer: TextBuffer) -> None:
+        self.buffer = buffer
+        self.undo_stack: deque[HistoryStep] = deque()
+        self.redo_stack: list[HistoryStep] = []
+        self.size = 0
+        self.sealed = True
+        self.applying = False
+        # Lines and cursor from right before the edit in progress
+        self.pending: tuple[list[str] | None, Pos] | None = None
+        # Steps of the batch in progress, see `batch`
+        self.group: list[HistoryElement] | None = None
+
+    def get_open_element(self) -> HistoryElement | None:
+        if (
+            self.sealed
+            or self.group is not None
+            or shared.mode != FileState.INSERT
+            or not self.undo_stack
+        ):
+            return None
+        return self.undo_stack[-1]
+
+    @contextmanager
+    def batch(self) -> t.Iterator[None]:
+        """Makes the edits made inside a single undo step"""
+
+        self.group = []
+        try:
+            yield
+        finally:
+            elements, self.group = self.group, None
+            if elements:
+                self.push(HistoryGroup(elements))
+                self.sealed = True
+
+    def seal(self) -> None:
+        """Makes the next edit start a new undo step"""
+
+        self.sealed = True
+
+    def before_edit(self, y: int, line_count: int) -> None:
+        if self.applying:
+            return
+
+        cursor = Pos(shared.cursor_pos.x, shared.cursor_pos.y)
+        element = self.get_open_element()
+        if element is not None and element.y <= y <= y + line_count <= (
+            element.y + element.line_count
+        ):
+            # The open step already knows what these lines used to be
+            self.pending = None, cursor
+            return
+
+        self.pending = self.buffer[y : y + line_count], cursor
+
+    def after_edit(self, event: EditEvent) -> None:
+        if self.applying or self.pending is None:
+            return
+
+        old_lines, cursor = self.pending
+        self.pending = None
+        self.redo_stack.clear()
+
+        element = self.get_open_element()
+        if element is not None and (
+            event.y <= element.y + element.line_count
+            and event.y + event.old_line_count >= element.y
+        ):
+            self.size -= self.undo_stack.pop().size
+            element = self.merge(element, event, old_lines or [])
+        else:
+            element = HistoryElement(event.y, old_lines, event.new_line_count, cursor)
+            if self.group is not None:
+                self.group.append(element)
+                return
+
+        self.push(element)
+        self.sealed = shared.mode != FileState.INSERT
+
+    def merge(
+        self, element: HistoryElement, event: EditEvent, old_lines: list[str]
+    ) -> HistoryElement:
+        """Grows `element` so that it also undoes `event`"""
+
+        element_end = element.y + element.line_count
+        start = min(element.y, event.y)
+        end = max(element_end, event.y + event.old_line_count)
+
+        head = old_lines[: max(element.y - event.y, 0)]
+        tail = old_lines[element_end - event.y :]
+        return HistoryElement(
+            start,
+            head + element.lines + tail,
+            end - start + event.line_delta,
+            element.cursor,
+        )
+
+    def push(self, element: HistoryStep) -> None:
+        self.undo_stack.append(element)
+        self.size += element.size
+
+        history = shared.config.get("history", {})
+        budget = history.get("memory_mb", DEFAULT_HISTORY_MEMORY_MB) * 1024**2
+        while self.size > budget and len(self.undo_stack) > 1:
+            self.size -= self.undo_stack.popleft().size
+
+    def apply(self, element: HistoryStep) -> HistoryStep:
+        """Restores the lines of `element`, returns the step that reverses it"""
+
+        if isinstance(element, HistoryGroup):
+            # Last made first, each inverse is in turn undone last
+            return HistoryGroup(
+                [self.apply(step) for step in reversed(element.elements)]
+            )
+
+        line_count = len(self.buffer)
+        self.applying = True
+        try:
+            replaced = self.buffer.replace_lines(
+                element.y, element.line_count, element.lines
+            )
+        finally:
+            self.applying = False
+
+        inverse = HistoryElement(
+            element.y,
+            replaced,
+            element.line_count + len(self.buffer) - line_count,
+            Pos(shared.cursor_pos.x, shared.cursor_pos.y),
+        )
+        shared.cursor_pos = Pos(element.cursor.x, element.cursor.y)
+        return inverse
 
     def undo(self):
-        return
-        if not self.history:
+        if not self.undo_stack:
+            return
+
+        element = self.undo_stack.pop()
+        self.size -= element.size
+        self.redo_stack.append(self.apply(element))
+        self.sealed = True
+
+    def redo(self):
+        if not self.redo_stack:
             return
 
-        element = self.history.pop()
-        if element.action == Action.INSERT:
-            self._undo_insert(element)
-        elif element.action == Action.DELETE:
-            self._undo_delete(element)
+        element = self.redo_stack.pop()
+        inverse = self.apply(element)
+        self.undo_stack.append(inverse)
+        self.size += inverse.size
+        self.sealed = True
 
 
 PgKey: t.TypeAlias = int | str
@@ -145,7 +287,8 @@ class AcceleratedKeyPress:
     ) -> None:
         self.key = key
         self.callback = callback
-        self.timer = Time(timer_cd)
+        self.timer = scheduler.create(timer_cd, self.on_timer)
+        self.repeat_due = False
         self.timer_cd = timer_cd
         self.timer_delta = timer_delta
         self.timer_min = timer_min
@@ -157,16 +300,23 @@ class AcceleratedKeyPress:
 
     def on_first_call(self):
         self.callback()
-        self.timer.reset()
-        self.timer.time_to_pass = self.timer_cd
+        self.repeat_due = False
+        self.timer.start(self.timer_cd)
+
+    def on_timer(self):
+        self.repeat_due = True
 
     def handle_timer(self):
-        if self.timer.tick():
-            self.key_manager.update()
-            if self.timer.time_to_pass <= self.timer_min:
-                self.timer.time_to_pass = self.timer_min
-                return
-            self.timer.time_to_pass -= self.timer_delta
+        if not self.repeat_due:
+            return
+
+        self.repeat_due = False
+        # Released keys stop repeating until they are pressed again
+        if not shared.keys[self.key]:
+            return
+
+        self.key_manager.update()
+        self.timer.start(max(self.timer.interval - self.timer_delta, self.timer_min))
 
     def get_base_key_status(self) -> bool:
         if self.base_keys is None:
@@ -0,0 +1,130 @@
+"""
+Line lexers for the files that are not Python.
+
+Each lexer turns the columns of a line that are on screen into color
+spans, so only what is shown ever has to be lexed. They are a handful of regular expressions
+each, which is all a config or notes file needs to be readable.
+"""
+
+import re
+import typing as t
+from pathlib import Path
+
+from axedit import shared
+
+Color: t.TypeAlias = str
+# Half open `[start, end)` run of characters drawn in one color
+Span: t.TypeAlias = tuple[int, int, Color]
+# Lexes the columns `[start, end)` of a row, spans are in row columns
+Lexer: t.TypeAlias = t.Callable[[str, int, int], list[Span]]
+
+
+class RegexLexer:
+    """
+    Colors the matches of `(theme color, pattern)` rules, the first rule
+    matching at a position wins and the rest of the line is `default-fg`
+    """
+
+    def __init__(self, rules: list[tuple[str, str]]) -> None:
+        self.colors = {f"rule{index}": color for index, (color, _) in enumerate(rules)}
+        self.pattern = re.compile(
+            "|".join(
+                f"(?P<rule{index}>{pattern})"
+                for index, (_, pattern) in enumerate(rules)
+            ),
+            re.MULTILINE,
+        )
+
+    def __call__(self, row: str, start: int, end: int) -> list[Span]:
+        default = shared.theme["default-fg"]
+        spans: list[Span] = []
+
+        def add(start: int, end: int, color: Color) -> None:
+            if spans and spans[-1][2] == color:
+                start = spans.pop()[0]
+            spans.append((start, end, color))
+
+        x = start
+        for match in self.pattern.finditer(row, start, end):
+            match_start, match_end = match.span()
+            if match_start == match_end:
+                continue
+            if match_start > x:
+                add(x, match_start, default)
+            add(match_start, match_end, shared.theme[self.colors[match.lastgroup]])
+            x = match_end
+
+        end = min(end, len(row))
+        if x < end:
+            add(x, end, default)
+        return spans
+
+
+def lex_plain(row: str, start: int, end: int) -> list[Span]:
+    end = min(end, len(row))
+    if start >= end:
+        return []
+    return [(start, end, shared.theme["default-fg"])]
+
+
+_TOML_KEY = r"""(?:[\w-]+|"(?:\\.|[^"\\])*"|'[^']*')"""
+_TOML_NUMBER = (
+    r"[+-]?\b(?:0x[\da-fA-F_]+|0o[0-7_]+|0b[01_]+"
+    r"|[\d_]+(?:\.[\d_]+)?(?:[eE][+-]?\d+)?)\b"
+)
+
+lex_toml = RegexLexer(
+    [
+        ("string", r'"""(?:\\.|[^\\])*?(?:"""|$)'),
+        ("string", r"'''.*?(?:'''|$)"),
+        ("class", r"^\s*\[\[?[^\]]*\]\]?"),
+        ("var", rf"(?:^|(?<=[{{,]))\s*{_TOML_KEY}(?:\s*\.\s*{_TOML_KEY})*(?=\s*=)"),
+        ("string", r'"(?:\\.|[^"\\])*"?'),
+        ("string", r"'[^']*'?"),
+        ("comment", r"#.*"),
+        ("keyword", r"\b(?:true|false)\b"),
+        ("const", r"\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}:\d{2}\S*)?"),
+        ("const", _TOML_NUMBER),
+        ("const", r"[+-]?\b(?:inf|nan)\b"),
+    ]
+)
+
+lex_json = RegexLexer(
+    [
+        ("var", r'"(?:\\.|[^"\\])*"(?=\s*:)'),
+        ("string", r'"(?:\\.|[^"\\])*"?'),
+        ("keyword", r"\b(?:true|false|null)\b"),
+        ("const", r"-?\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b"),
+        ("match", r"[{}\[\]]"),
+    ]
+)
+
+lex_markdown = RegexLexer(
+    [
+        ("keyword", r"^\s{0,3}#{1,6}(?:\s.*|$)"),
+        ("comment", r"^\s{0,3}(?:```|~~~).*"),
+        ("comment", r"^\s*>.*"),
+        ("match", r"^\s*(?:[-*+]|\d+[.)])(?=\s)"),
+        ("string", r"`[^`]*`?"),
+        ("func", r"!?\[[^\]]*\]\([^)]*\)"),
+        ("const", r"\*\*(?=\S).*?\S\*\*"),
+        ("const", r"(?<!\w)__(?=\S).*?\S__(?!\w)"),
+        ("var", r"(?<![\w*])\*(?=\S)[^*]*?\S\*(?![\w*])"),
+        ("var", r"(?<!\w)_(?=\S)[^_]*?\S_(?!\w)"),
+    ]
+)
+
+LEXERS: dict[str, Lexer] = {
+    ".toml": lex_toml,
+    ".json": lex_json,
+    ".md": lex_markdown,
+    ".markdown": lex_markdown,
+}
+
+
+def get_lexer(file_name: str | None) -> Lexer:
+    """The lexer for a file by its extension, plain text if there is none"""
+
+    if file_name is None:
+        return lex_plain
+    return LEXERS.get(Path(file_name).suffix.lower(), lex_plain)
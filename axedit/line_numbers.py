@@ -46,10 +46,40 @@ class LineNumbers:
             or shared.font_offset
         )
 
-    def draw_lines(self):
+    def is_only_scrolled(self) -> bool:
+        """Whether the rendered numbers are still right, just shifted"""
+
+        return (
+            shared.cursor_pos.y == self.last_char_pos_y
+            and len(shared.chars) == self.last_chars_length
+            and self.surf.get_size()
+            == (shared.FONT_WIDTH * shared.line_number_digits, shared.srect.height)
+            and not is_event_frame(pygame.VIDEORESIZE)
+            and not shared.font_offset
+        )
+
+    def scroll_lines(self, max_lines: int) -> range:
+        """Shifts the rendered numbers, returns the rows that came into view"""
+
+        delta = self.scroll_char_offset - self.last_scroll_offset
+        self.surf.scroll(0, -delta * shared.FONT_HEIGHT)
+        exposed = self.surf.get_rect()
+        if delta > 0:
+            rows = range(max_lines - delta, max_lines)
+            exposed.top = rows.start * shared.FONT_HEIGHT
+        else:
+            rows = range(0, -delta)
+            exposed.height = len(rows) * shared.FONT_HEIGHT
+            # Below the last row, which is never drawn
+            bottom = self.surf.get_rect(top=max_lines * shared.FONT_HEIGHT)
+            self.surf.fill((0, 0, 0, 0), bottom)
+
+        self.surf.fill((0, 0, 0, 0), exposed)
+        return rows
+
+    def draw_lines(self, rows: range):
         rel = shared.config["line_numbers"]["relative"]
-        max_lines = int(shared.srect.height / shared.FONT_HEIGHT)
-        for i in range(max_lines):
+        for i in rows:
             alpha = 150
 
             lno = i + self.scroll_char_offset
@@ -80,9 +110,17 @@ class LineNumbers:
         self.last_chars_length = len(shared.chars)
 
     def draw(self):
+        first_render = self.once
         if not self.is_to_be_rendered():
             return
 
-        self.gen_blank()
-        self.draw_lines()
+        max_lines = int(shared.srect.height / shared.FONT_HEIGHT)
+        delta = self.scroll_char_offset - self.last_scroll_offset
+        if not first_render and self.is_only_scrolled() and abs(delta) < max_lines:
+            rows = self.scroll_lines(max_lines)
+        else:
+            self.gen_blank()
+            rows = range(max_lines)
+
+        self.draw_lines(rows)
         self.reset_modifiers()
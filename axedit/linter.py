@@ -5,15 +5,22 @@ import subprocess
 import sys
 import threading
 import time
+import typing as t
 
 import pygame
 
 from axedit import shared
-from axedit.funcs import get_text
+from axedit.buffer import EditEvent
+from axedit.compositor import Layer, get_style_key
+from axedit.funcs import get_versioned_json_text
+from axedit.idle import BACKGROUND_POLL_INTERVAL, wake_up
 from axedit.logs import logger
 
 SERVER_HOST = "127.0.0.1"
 
+# Lints of a document that is not active, with the version they are for
+LintCache: t.TypeAlias = tuple[int | None, list[dict]]
+
 
 class Linter:
     """
@@ -33,8 +40,13 @@ class Linter:
         )
         thread.start()
         self.lints: list[dict] = []
+        # Buffer version the lints were produced for
+        self.lints_version: int | None = None
+        self.sent_version: int | None = None
+        self.received: tuple[int, list[dict]] | None = None
         self.first_time_connected = True
         self.create_font()
+        self.layer = Layer(self.render_lints)
         self.receiving = False
         self.entered_editor = False
 
@@ -77,12 +89,11 @@ class Linter:
                 continue
 
     def to_update(self) -> bool:
-        return shared.chars_changed
+        return shared.chars.version not in (self.sent_version, self.lints_version)
 
     def receive_lints(self):
-        text = get_text()
-        data = {"file": shared.file_name, "text": text}
-        data = json.dumps(data)
+        self.sent_version, json_text = get_versioned_json_text()
+        data = f'{{"file": {json.dumps(shared.file_name)}, "text": {json_text}}}'
         l = len(data.encode())
 
         try:
@@ -112,8 +123,9 @@ class Linter:
             break
 
         self.receiving = False
-        self.lints: list[dict] = json.loads(received_data)
-        self.filter_lints()
+        lints: list[dict] = json.loads(received_data)
+        self.received = self.sent_version, self.filter_lints(lints)
+        wake_up()
 
     def close_connections(self):
         if hasattr(self, "client_socket"):
@@ -121,18 +133,67 @@ class Linter:
         if hasattr(self, "server_process"):
             self.server_process.kill()
 
-    def filter_lints(self):
+    def filter_lints(self, lints: list[dict]) -> list[dict]:
         locs = []
-        for lint in self.lints[::-1]:
+        for lint in lints[::-1]:
             row = lint["location"]["row"]
             if row in locs:
-                self.lints.remove(lint)
+                lints.remove(lint)
                 continue
             locs.append(row)
 
+        return lints
+
+    def shift_lints(self, event: EditEvent) -> None:
+        """Moves the lints below an edit along with their lines"""
+
+        moved_from = event.y + event.old_line_count
+        removed_from = event.y + event.new_line_count
+        kept = []
+        for lint in self.lints:
+            row = lint["location"]["row"] - 1
+            if removed_from <= row < moved_from:
+                continue
+            if row >= moved_from:
+                lint["location"]["row"] += event.line_delta
+                lint["end_location"]["row"] += event.line_delta
+            kept.append(lint)
+
+        self.lints = kept
+
+    def catch_up_lints(self):
+        """Applies the edits made since the lints were produced"""
+
+        if self.received is not None:
+            version, lints = self.received
+            self.received = None
+            # Lints for another document, or too old to catch up
+            if shared.chars.events_since(version) is not None:
+                self.lints_version, self.lints = version, lints
+
+        if self.lints_version is None:
+            return
+
+        events = shared.chars.events_since(self.lints_version)
+        if events is None:
+            self.lints = []
+            self.lints_version = None
+            return
+
+        for event in events:
+            self.shift_lints(event)
+        self.lints_version = shared.chars.version
+
+    def get_lint_cache(self) -> LintCache:
+        return self.lints_version, self.lints
+
+    def set_lint_cache(self, cache: LintCache | None) -> None:
+        self.received = None
+        self.lints_version, self.lints = (None, []) if cache is None else cache
+
     def threaded_lints_receiver(self) -> None:
         while True:
-            time.sleep(0)
+            time.sleep(BACKGROUND_POLL_INTERVAL)
             if not self.connected:
                 continue
 
@@ -152,6 +213,7 @@ class Linter:
 
     def update(self):
         self.entered_editor = True
+        self.catch_up_lints()
 
     def render_squigline(
         self,
@@ -244,5 +306,29 @@ class Linter:
             surf = shared.FONT.render(msg, True, color)
             editor_surf.blit(surf, (x, y))
 
+    def get_damage_key(self) -> tuple:
+        """What the drawn lints look like, for the compositor"""
+
+        return tuple(
+            (
+                lint["code"],
+                lint["message"],
+                lint["location"]["row"],
+                lint["location"]["column"],
+                lint["end_location"]["row"],
+                lint["end_location"]["column"],
+            )
+            for lint in self.lints
+        )
+
     def draw(self, editor_surf: pygame.Surface):
-        self.render_lints(editor_surf)
+        self.layer.update(
+            (
+                get_style_key(),
+                self.get_damage_key(),
+                shared.chars.version,
+                shared.scroll.x,
+                shared.scroll.y,
+            )
+        )
+        self.layer.draw(editor_surf)
@@ -0,0 +1,261 @@
+"""
+Lazily loaded lines of a very large file.
+
+The file is memory mapped and the offsets of its lines are indexed by a
+background thread, so opening it costs nothing up front. Lines are only
+decoded when something reads them. Edits never touch the mapping, they
+are kept as plain line lists spliced in between ranges of original lines.
+"""
+
+import mmap
+import re
+import threading
+import typing as t
+from array import array
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from operator import sub
+
+_NEWLINE = re.compile(b"\n")
+_INDEX_CHUNK_SIZE = 1 << 24
+_DECODE_CHUNK_LINES = 1 << 14
+_CACHE_SIZE = 4096
+
+# A piece is either a `range` of original line numbers or a list of new lines
+Piece: t.TypeAlias = range | list[str]
+
+
+def is_mappable_encoding(encoding: str) -> bool:
+    """Whether lines can be split on the raw newline byte"""
+
+    try:
+        return "\n".encode(encoding) == b"\n"
+    except LookupError:
+        return False
+
+
+class MappedLines:
+    """A mutable sequence of the lines of a memory mapped file"""
+
+    def __init__(self, path: str, encoding: str) -> None:
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._encoding = encoding
+        self._crlf = self._map.find(b"\r\n", 0, _INDEX_CHUNK_SIZE) != -1
+
+        # Byte offset where each original line starts, plus the end of the file
+        self._line_starts = array("q", [0])
+        self._indexed = threading.Event()
+        # How many original lines there are of each length in characters,
+        # counted while indexing
+        self._line_lengths: Counter[int] = Counter()
+        self._measured_lines = 0
+        self._longest_line = 0
+        self._cache: OrderedDict[int, str] = OrderedDict()
+
+        self._pieces: list[Piece] = []
+        self._piece_starts: list[int] = [0]
+
+        threading.Thread(target=self._build_index, daemon=True).start()
+
+    @property
+    def indexing(self) -> bool:
+        return not self._indexed.is_set()
+
+    def _build_index(self) -> None:
+        size = len(self._map)
+        for chunk_start in range(0, size, _INDEX_CHUNK_SIZE):
+            chunk_end = min(chunk_start + _INDEX_CHUNK_SIZE, size)
+            self._line_starts.extend(
+                match.end()
+                for match in _NEWLINE.finditer(self._map, chunk_start, chunk_end)
+            )
+            self._measure_lines()
+
+        if self._line_starts[-1] != size:
+            # The last line has no newline, it is measured as if it had one
+            self._line_starts.append(size + 1)
+            self._measure_lines()
+            self._line_starts[-1] = size
+
+        self._pieces = [range(len(self._line_starts) - 1)]
+        self._piece_starts = [0, len(self._pieces[0])]
+        self._indexed.set()
+
+    def _measure_lines(self) -> None:
+        """Counts the lengths of the lines indexed since the last call"""
+
+        starts = self._line_starts
+        measured, indexed = self._measured_lines, len(starts) - 1
+        if indexed == measured:
+            return
+
+        raw = self._map[starts[measured] : starts[indexed]]
+        if raw.isascii() and b"\r" not in raw:
+            # One byte per character, less the newline
+            sizes = Counter(
+                map(sub, starts[measured + 1 : indexed + 1], starts[measured:indexed])
+            )
+            lengths = Counter({size - 1: count for size, count in sizes.items()})
+        else:
+            # Measured as `_original_line` reads them, so edits take out
+            # exactly the lengths that were counted
+            lines = self._decode(raw).split("\n")[: indexed - measured]
+            lengths = Counter(len(line) - line.endswith("\r") for line in lines)
+
+        self._line_lengths.update(lengths)
+        self._longest_line = max(self._longest_line, max(lengths))
+        self._measured_lines = indexed
+
+    def longest_indexed_line(self) -> int:
+        """Length of the longest line indexed so far"""
+
+        return self._longest_line
+
+    def original_line_lengths(self) -> Counter[int]:
+        """How many original lines there are of each length in characters"""
+
+        self._indexed.wait()
+        return self._line_lengths.copy()
+
+    def close(self) -> None:
+        self._indexed.wait()
+        self._map.close()
+
+    # Reading
+
+    def _original_line(self, n: int) -> str:
+        line = self._cache.get(n)
+        if line is not None:
+            self._cache.move_to_end(n)
+            return line
+
+        raw = self._map[self._line_starts[n] : self._line_starts[n + 1]]
+        line = self._decode(raw).removesuffix("\n").removesuffix("\r")
+
+        self._cache[n] = line
+        if len(self._cache) > _CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return line
+
+    def _original_lines(self, lines: range) -> t.Iterator[str]:
+        """Decodes a run of original lines in bulk"""
+
+        for start in range(lines.start, lines.stop, _DECODE_CHUNK_LINES):
+            stop = min(start + _DECODE_CHUNK_LINES, lines.stop)
+            raw = self._map[self._line_starts[start] : self._line_starts[stop]]
+            text = self._decode(raw)
+            if self._crlf:
+                text = text.replace("\r\n", "\n")
+
+            decoded = text.split("\n")
+            # The last line of the file may have no trailing newline
+            yield from decoded[: stop - start]
+
+    def _decode(self, raw: bytes) -> str:
+        return raw.decode(self._encoding, errors="replace")
+
+    def __len__(self) -> int:
+        if self.indexing:
+            return len(self._line_starts) - 1
+        return self._piece_starts[-1]
+
+    @t.overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @t.overload
+    def __getitem__(self, index: slice) -> list[str]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            self._indexed.wait()
+            index += len(self)
+
+        if self.indexing:
+            if 0 <= index < len(self._line_starts) - 1:
+                return self._original_line(index)
+            self._indexed.wait()
+
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+
+        piece_index = bisect_right(self._piece_starts, index) - 1
+        piece = self._pieces[piece_index]
+        local = index - self._piece_starts[piece_index]
+        if isinstance(piece, list):
+            return piece[local]
+        return self._original_line(piece[local])
+
+    def __iter__(self) -> t.Iterator[str]:
+        self._indexed.wait()
+        for piece in self._pieces:
+            if isinstance(piece, list):
+                yield from piece
+            else:
+                yield from self._original_lines(piece)
+
+    # Writing
+
+    def __setitem__(self, index: int | slice, value) -> None:
+        self._indexed.wait()
+        if isinstance(index, slice):
+            start, stop, _ = index.indices(len(self))
+            self._replace(start, max(start, stop), list(value))
+            return
+
+        if index < 0:
+            index += len(self)
+        piece_index = bisect_right(self._piece_starts, index) - 1
+        piece = self._pieces[piece_index]
+        if isinstance(piece, list):
+            piece[index - self._piece_starts[piece_index]] = value
+        else:
+            self._replace(index, index + 1, [value])
+
+    def append(self, line: str) -> None:
+        self[len(self) : len(self)] = [line]
+
+    def _replace(self, start: int, stop: int, lines: list[str]) -> None:
+        first = self._split_at(start)
+        last = self._split_at(stop)
+        self._pieces[first:last] = [lines] if lines else []
+        self._merge_around(first)
+        self._update_piece_starts()
+
+    def _split_at(self, index: int) -> int:
+        """Makes a piece start at `index` and returns that piece's position"""
+
+        piece_index = bisect_right(self._piece_starts, index) - 1
+        if piece_index >= len(self._pieces):
+            return len(self._pieces)
+
+        local = index - self._piece_starts[piece_index]
+        if local == 0:
+            return piece_index
+
+        piece = self._pieces[piece_index]
+        self._pieces[piece_index : piece_index + 1] = [piece[:local], piece[local:]]
+        self._update_piece_starts()
+        return piece_index + 1
+
+    def _merge_around(self, index: int) -> None:
+        """Joins neighbouring line lists so the piece table stays short"""
+
+        start = max(index - 1, 0)
+        end = min(index + 2, len(self._pieces))
+        merged: list[Piece] = []
+        for piece in self._pieces[start:end]:
+            if merged and isinstance(piece, list) and isinstance(merged[-1], list):
+                merged[-1] = merged[-1] + piece
+            else:
+                merged.append(piece)
+        self._pieces[start:end] = merged
+
+    def _update_piece_starts(self) -> None:
+        starts = [0]
+        for piece in self._pieces:
+            starts.append(starts[-1] + len(piece))
+        self._piece_starts = starts
@@ -4,6 +4,7 @@ import pygame
 
 from axedit import shared
 from axedit.cmd_bar import CommandBar
+from axedit.compositor import compositor
 from axedit.file_selector import FileSelector
 from axedit.funcs import get_icon
 from axedit.logs import logger
@@ -159,6 +160,7 @@ class MenuState:
             self.next_state = self.file_selector.next_state
 
     def draw(self):
+        compositor.damage_all()
         if not shared.selecting_file:
             self.command_bar.draw()
         dist_between_em = 70
@@ -5,7 +5,7 @@ import re
 import pygame
 
 from axedit import shared
-from axedit.classes import CharList, Pos
+from axedit.classes import Pos
 from axedit.funcs import center_cursor
 from axedit.logs import logger
 from axedit.state_enums import FileState
@@ -19,10 +19,10 @@ def on_percent() -> None:
     # If sitting on opening bracket
     if current_char in brakies:
         for y_offset, row in enumerate(shared.chars[shared.cursor_pos.y :]):
-            row: list
+            row: str
             try:
                 start_find = shared.cursor_pos.x + 1 if y_offset == 0 else 0
-                # logger.info(f"{"".join(row)=}, {brakies[current_char]=}, {start_find=}")
+                # logger.info(f"{row=}, {brakies[current_char]=}, {start_find=}")
 
                 ignore_count = 0
                 for i, char in enumerate(row[start_find:]):
@@ -50,7 +50,7 @@ def on_percent() -> None:
         for y_offset, row in enumerate(
             reversed(shared.chars[: shared.cursor_pos.y + 1])
         ):
-            row: list
+            row: str
             try:
                 # start_find = len(row) - shared.cursor_pos.x if y_offset == 0 else -1
                 start_find = shared.cursor_pos.x if y_offset == 0 else len(row)
@@ -80,7 +80,7 @@ def on_percent() -> None:
 
     # If sitting on non-bracket character
     for y_offset, row in enumerate(reversed(shared.chars[: shared.cursor_pos.y + 1])):
-        row: list
+        row: str
 
         start_find = shared.cursor_pos.x if y_offset == 0 else len(row)
 
@@ -197,28 +197,11 @@ def on_p():
         paste_output = pygame.scrap.get_text()
     except UnicodeDecodeError:
         return
-    paste_lines = paste_output.split("\n")
 
     shared.cursor_pos.x += 1
     saved_pos = Pos(shared.cursor_pos.x, shared.cursor_pos.y)
-
-    store_it = shared.chars[shared.cursor_pos.y][shared.cursor_pos.x :]
-    for line in paste_lines:
-        given_line = shared.chars[shared.cursor_pos.y]
-        shared.chars[shared.cursor_pos.y] = given_line[: shared.cursor_pos.x] + list(
-            line
-        )
-
-        shared.cursor_pos.y += 1
-        shared.chars.insert(shared.cursor_pos.y, CharList([]))
-        shared.cursor_pos.x = 0
-    shared.chars[shared.cursor_pos.y - 2].extend(store_it)
-
-    # Totally not monkey patching!!
-    for _ in range(2):
-        shared.chars.pop()
-
-    shared.cursor_pos = Pos(saved_pos.x, saved_pos.y)
+    shared.chars.insert(shared.cursor_pos, paste_output.removesuffix("\n"))
+    shared.cursor_pos = saved_pos
 
 
 def on_left_brace():
@@ -263,7 +246,7 @@ def on_zero():
 
 def on_dd():
     if len(shared.chars) == 1:
-        shared.chars[0] = CharList([])
+        shared.chars.delete_lines(0)
         return
     match = re.match(r".\d.", shared.action_str)
     if match is None:
@@ -274,12 +257,8 @@ def on_dd():
         start, end = match.span()
         n_lines = shared.action_str[start:end]
         n_lines = int(n_lines)
-    copy_output = ""
-    for _ in range(n_lines):
-        try:
-            copy_output += "".join(shared.chars.pop(shared.cursor_pos.y)) + "\n"
-        except IndexError:
-            break
+    deleted_lines = shared.chars.delete_lines(shared.cursor_pos.y, n_lines)
+    copy_output = "".join(line + "\n" for line in deleted_lines)
 
     pygame.scrap.put_text(copy_output)
 
@@ -311,3 +290,7 @@ def on_G():
     shared.cursor_pos.y = len(shared.chars) - 1
     shared.cursor_pos.x = len(shared.chars[-1])
     center_cursor()
+
+
+def on_u():
+    shared.chars.history.undo()
@@ -1,80 +1,229 @@
 """
 Problem: We need to figure out if something imported is a submodule or not
-Solution: Try to see local and site-packages directories?
+Solution: Search the environment's `sys.path` the way the import system does,
+with the directory listings indexed in memory and kept on disk between runs
 """
 
+import json
+import os
+import shutil
+import subprocess
 import sys
+import time
+from dataclasses import dataclass
 from pathlib import Path
 
+from platformdirs import user_cache_dir
 
-def _is_submodule(mod_path: Path, sub_module_name: str) -> bool:
-    if not mod_path.exists():
-        return False
-
-    modules = []
-
-    for file in mod_path.iterdir():
-        if file.name.endswith(".pyi") or file.name.endswith(".py"):
-            modules.append(file.stem)
-
-        if file.is_dir() and (file / "__init__.py").exists():
-            modules.append(file.stem)
-
-    return sub_module_name in modules
-
-
-def _is_local_module(main_module_name: str, sub_module_name: str) -> bool:
-    dots = "."
-    if main_module_name.startswith("."):
-        *dots, main_module_name = main_module_name.split(".")
-        dots = len(dots) * "."
-
-    current_path = Path(dots)
-    mod_path = current_path / main_module_name
-
-    return _is_submodule(mod_path, sub_module_name)
-
-
-def _is_site_package_module(main_module_name: str, sub_module_name: str) -> bool:
-    scripts_path = Path(sys.executable).parent / "Lib/site-packages/"
-    mod_path = scripts_path / main_module_name
-
-    return _is_submodule(mod_path, sub_module_name)
-
-
-def is_editable_module(main_module_name: str, sub_module_name: str) -> bool:
-    scripts_path = Path(sys.executable).parent / "Lib/site-packages/"
-    easy_install = scripts_path / "easy-install.pth"
-    mod_path = scripts_path / main_module_name
-
-    if not easy_install.exists():
-        return False
-    with open(easy_install) as f:
-        modules = f.readlines()
-
-    for mod_path in modules:
-        mod_path = Path(mod_path.strip())
-        lactose = list(mod_path.glob("*.egg-info"))
-        if not lactose:
-            return False
-
-        mod_path = mod_path / lactose[0].stem
-        if mod_path.name == main_module_name:
-            if _is_submodule(mod_path, sub_module_name):
-                return True
+from axedit.logs import logger
+
+CACHE_FILE_PATH = Path(user_cache_dir("axedit")) / "module_index.json"
+# Seconds a directory listing is trusted before its mtime is looked at again
+RECHECK_INTERVAL = 5.0
+# Last suffix of files that import as modules, extension modules carry ABI tags
+MODULE_SUFFIXES = ("py", "pyi", "pyc", "so", "pyd")
+
+PACKAGE, MODULE, NAMESPACE = "package", "module", "namespace"
+# What a name in a directory imports as when several entries share it
+_KIND_PRIORITY = {NAMESPACE: 0, MODULE: 1, PACKAGE: 2}
+
+
+@dataclass(slots=True)
+class Listing:
+    mtime: int
+    # Importable names in the directory and whether they are packages
+    names: dict[str, str]
+    checked: float = 0.0
+
+
+def get_environment_python() -> str:
+    """The Python of the shell the editor was launched from"""
+
+    return shutil.which("python") or shutil.which("py") or sys.executable
+
+
+def get_search_path() -> list[Path]:
+    """`sys.path` of the environment, the editor's own if it can't be read"""
+
+    command = [
+        get_environment_python(),
+        "-c",
+        "import json, sys; print(json.dumps(sys.path))",
+    ]
+    try:
+        output = subprocess.run(
+            command, capture_output=True, text=True, timeout=5.0, check=True
+        ).stdout
+        paths = json.loads(output)
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        logger.warning(f"Could not read the environment's sys.path: {e}")
+        paths = sys.path
+
+    return [Path(path or os.getcwd()).absolute() for path in paths]
+
+
+def scan_directory(path: str) -> dict[str, str]:
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return {}
+
+    names = {}
+    for entry in entries:
+        name, _, suffix = entry.name.partition(".")
+        if not name.isidentifier():
+            continue
+
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            continue
+
+        if is_dir:
+            if suffix:
+                continue
+            init = os.path.join(entry.path, "__init__")
+            kind = NAMESPACE
+            if os.path.exists(f"{init}.py") or os.path.exists(f"{init}.pyi"):
+                kind = PACKAGE
+        elif suffix.rpartition(".")[2] in MODULE_SUFFIXES:
+            kind = MODULE
+        else:
+            continue
+
+        if _KIND_PRIORITY[kind] > _KIND_PRIORITY.get(names.get(name), -1):
+            names[name] = kind
+
+    return names
+
+
+class ModuleIndex:
+    """
+    Listings of the directories imports are looked up in, only ever used
+    from the analysis thread
+    """
+
+    def __init__(self, cache_path: Path = CACHE_FILE_PATH) -> None:
+        self.cache_path = cache_path
+        self.search_path: list[Path] | None = None
+        self.listings: dict[str, Listing] | None = None
+        self.changed = False
+        # Recent answers, with when they were worked out
+        self.answers: dict[tuple[str, str, Path | None], tuple[bool, float]] = {}
+
+    def load(self) -> dict[str, Listing]:
+        """Listings of the last run, checked against mtimes on first use"""
+
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+            return {
+                path: Listing(mtime, names) for path, (mtime, names) in cached.items()
+            }
+        except (OSError, ValueError, TypeError, AttributeError):
+            return {}
+
+    def save(self) -> None:
+        if not self.changed or self.listings is None:
+            return
+
+        self.changed = False
+        cached = {
+            path: (listing.mtime, listing.names)
+            for path, listing in self.listings.items()
+        }
+        temp_path = self.cache_path.with_name(f"{self.cache_path.name}.{os.getpid()}")
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_path, "w") as f:
+                json.dump(cached, f)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not save the module index: {e}")
+
+    def get_names(self, directory: Path) -> dict[str, str]:
+        if self.listings is None:
+            self.listings = self.load()
+
+        key = str(directory)
+        listing = self.listings.get(key)
+        now = time.monotonic()
+        if listing is not None and now - listing.checked < RECHECK_INTERVAL:
+            return listing.names
+
+        try:
+            mtime = os.stat(key).st_mtime_ns
+        except OSError:
+            mtime = -1
+
+        if listing is None or listing.mtime != mtime:
+            listing = Listing(mtime, scan_directory(key) if mtime != -1 else {})
+            self.listings[key] = listing
+            self.changed = True
+
+        listing.checked = now
+        return listing.names
+
+    def find_package(self, module_name: str, search_path: list[Path]) -> list[Path]:
+        """Directories of a package, found like `importlib.util.find_spec`"""
+
+        for part in module_name.split("."):
+            portions = []
+            for directory in search_path:
+                kind = self.get_names(directory).get(part)
+                if kind == PACKAGE:
+                    portions = [directory / part]
+                    break
+                if kind == MODULE:
+                    return []
+                if kind == NAMESPACE:
+                    portions.append(directory / part)
+
+            search_path = portions
+            if not search_path:
+                break
+
+        return search_path
+
+    def is_module(
+        self, main_module_name: str, sub_module_name: str, origin: Path | None
+    ) -> bool:
+        key = main_module_name, sub_module_name, origin
+        now = time.monotonic()
+        answer = self.answers.get(key)
+        if answer is not None and now - answer[1] < RECHECK_INTERVAL:
+            return answer[0]
+
+        found = self.find_module(main_module_name, sub_module_name, origin)
+        self.answers[key] = found, now
+        return found
+
+    def find_module(
+        self, main_module_name: str, sub_module_name: str, origin: Path | None
+    ) -> bool:
+        if origin is not None:
+            packages = [origin]
+            if main_module_name:
+                packages = self.find_package(main_module_name, packages)
+        elif main_module_name:
+            if self.search_path is None:
+                self.search_path = get_search_path()
+            packages = self.find_package(main_module_name, self.search_path)
+        else:
             return False
 
-    return False
+        return any(sub_module_name in self.get_names(package) for package in packages)
 
 
-def is_module(main_module_name: str, sub_module_name: str) -> bool:
-    if is_editable_module(main_module_name, sub_module_name):
-        return True
+module_index = ModuleIndex()
 
-    if _is_local_module(main_module_name, sub_module_name):
-        return True
 
-    if _is_site_package_module(main_module_name, sub_module_name):
-        return True
+def is_module(
+    main_module_name: str, sub_module_name: str, origin: Path | None = None
+) -> bool:
+    """
+    Whether `from main_module_name import sub_module_name` imports a module,
+    relative to the `origin` directory for relative imports
+    """
 
-    return False
+    return module_index.is_module(main_module_name, sub_module_name, origin)
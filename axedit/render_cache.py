@@ -0,0 +1,117 @@
+"""
+Caches for turning text into surfaces.
+
+Rasterizing text through FreeType is by far the most expensive part of
+drawing the editor. Glyphs are rendered once per (character, color,
+font size) and from then on a line is drawn by blitting them. The
+highlighted chunks of lines are kept as surfaces too, so chunks that did
+not change are a single blit.
+"""
+
+import typing as t
+from collections import OrderedDict
+
+import pygame
+
+from axedit import shared
+
+DEFAULT_LINE_CACHE_MEMORY_MB = 16
+
+GlyphKey = tuple[str, str, int]
+LineKey = tuple[str, tuple[tuple[int, int, str], ...], str, int]
+
+
+class GlyphAtlas:
+    """Rendered glyphs, the least recently used evicted first"""
+
+    def __init__(self, max_glyphs: int = 4096) -> None:
+        self.max_glyphs = max_glyphs
+        # `None` for characters the font can not render
+        self.glyphs: OrderedDict[GlyphKey, pygame.Surface | None] = OrderedDict()
+
+    def get(self, char: str, color: str) -> pygame.Surface | None:
+        key = char, color, shared.FONT_SIZE
+        if key in self.glyphs:
+            self.glyphs.move_to_end(key)
+            return self.glyphs[key]
+
+        try:
+            glyph = shared.FONT.render(char, True, color)
+        except pygame.error:
+            glyph = None
+
+        self.glyphs[key] = glyph
+        if len(self.glyphs) > self.max_glyphs:
+            self.glyphs.popitem(last=False)
+        return glyph
+
+    def clear(self) -> None:
+        self.glyphs.clear()
+
+    def refresh(self) -> None:
+        """Forgets every glyph once the theme or the font changes"""
+
+        if shared.theme_changed or shared.font_offset:
+            self.clear()
+
+
+class LineSurfaceCache:
+    """
+    Rendered chunks of lines keyed by their text, color spans, theme and
+    font size, the least recently used evicted once over the memory budget.
+    """
+
+    def __init__(self) -> None:
+        self.surfaces: OrderedDict[LineKey, pygame.Surface | None] = OrderedDict()
+        self.size = 0
+
+    def get_budget(self) -> int:
+        line_cache = shared.config.get("line_cache", {})
+        return int(line_cache.get("memory_mb", DEFAULT_LINE_CACHE_MEMORY_MB) * 1024**2)
+
+    def get(
+        self,
+        row: str,
+        spans: list[tuple[int, int, str]],
+        render: t.Callable[[str, list[tuple[int, int, str]]], pygame.Surface | None],
+    ) -> pygame.Surface | None:
+        """The surface of a line, `render`ed only if it is not cached"""
+
+        key = row, tuple(spans), shared.config["theme"]["name"], shared.FONT_SIZE
+        if key in self.surfaces:
+            self.surfaces.move_to_end(key)
+            return self.surfaces[key]
+
+        surface = render(row, spans)
+        size = get_surface_size(surface)
+        budget = self.get_budget()
+        if size > budget:
+            # Caching it would evict every other line for nothing
+            return surface
+
+        self.surfaces[key] = surface
+        self.size += size
+        while self.size > budget:
+            _, evicted = self.surfaces.popitem(last=False)
+            self.size -= get_surface_size(evicted)
+        return surface
+
+    def clear(self) -> None:
+        self.surfaces.clear()
+        self.size = 0
+
+    def refresh(self) -> None:
+        """Drops lines that can not be hit again after a theme or font change"""
+
+        if shared.theme_changed or shared.font_offset:
+            self.clear()
+
+
+def get_surface_size(surface: pygame.Surface | None) -> int:
+    if surface is None:
+        return 0
+    return surface.get_pitch() * surface.get_height()
+
+
+glyph_atlas = GlyphAtlas()
+line_cache = LineSurfaceCache()
@@ -1,6 +1,7 @@
 import pygame
 
 from axedit import shared
+from axedit.compositor import compositor
 from axedit.logs import logger
 
 
@@ -30,6 +31,7 @@ class HorizontalScrollBar:
             self.alpha -= self.fade_speed * shared.dt
             if self.alpha < 0:
                 self.alpha = 0
+        shared.animating = shared.animating or 0 < self.alpha < 255
 
     def handle_scroll(self):
         if not shared.mouse_press[0]:
@@ -44,7 +46,7 @@ class HorizontalScrollBar:
             self.rect.x = shared.srect.width - self.rect.width
 
     def apply_scroll(self):
-        max_scroll_x = len(max(shared.chars)) * shared.FONT_WIDTH
+        max_scroll_x = shared.chars.max_line_length() * shared.FONT_WIDTH
         shared.scroll.x = max_scroll_x * (
             (self.rect.x - self.zero_pos)
             / (shared.srect.width - self.rect.width - self.zero_pos)
@@ -62,6 +64,8 @@ class HorizontalScrollBar:
 
     def draw(self):
         if shared.typing_cmd:
+            compositor.hide("scrollbar")
             return
         self.surf.set_alpha(self.alpha)
         shared.screen.blit(self.surf, self.rect)
+        compositor.show("scrollbar", int(self.alpha), self.rect)
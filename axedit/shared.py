@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import inspect
+import locale
 import typing as t
 from pathlib import Path
 
@@ -11,9 +12,12 @@ from axedit.state_enums import FileState
 
 if t.TYPE_CHECKING:
     from axedit.autocompletions import AutoCompletions
-    from axedit.classes import CharList, Pos
+    from axedit.buffer import TextBuffer
+    from axedit.classes import Pos
     from axedit.cursor import Cursor
-    from axedit.input_queue import HistoryManager
+    from axedit.documents import DocumentManager
+    from axedit.file_watcher import FileWatcher
+    from axedit.idle import IdleLoop
     from axedit.linter import Linter
 
 pygame.font.init()
@@ -42,19 +46,24 @@ kp: list[bool]
 kr: list[bool]
 dt: float
 clock: pygame.Clock
+idle_loop: IdleLoop
 
 # Objects
-chars: CharList[CharList[str]]
+chars: TextBuffer
 cursor_pos: Pos
 cursor: Cursor
 visual_mode_axis: Pos
 autocompletion: AutoCompletions
 linter: Linter
+file_watcher: FileWatcher
+documents: DocumentManager
 # observer: object
 
 # Config
 mode: FileState = FileState.NORMAL
 file_name: str | None = None
+file_encoding: str = locale.getpreferredencoding(False)
+file_newline: str = "\n"
 theme: dict[
     t.Literal[
         "default-bg",
@@ -79,7 +88,6 @@ theme: dict[
 config: tomlkit.TOMLDocument
 
 # Registers
-history: HistoryManager
 frame_cache: dict[t.Callable, t.Any]
 registered_number: int = 1
 action_queue: list[str]
@@ -101,9 +109,9 @@ cursor_x_changed = False
 cursor_y_changed = False
 editing_config_file = False
 scrolling = False
+animating = False
 naming_file: bool
 chars_changed: bool
 saved: bool
-import_line_changed: bool
 actions_modified: bool
 typing_cmd: bool
@@ -1,5 +1,6 @@
 import typing as t
 
+from axedit.compositor import compositor
 from axedit.editorstate import EditorState
 from axedit.menu_state import MenuState
 from axedit.state_enums import State
@@ -30,6 +31,7 @@ class StateManager:
     @state_enum.setter
     def state_enum(self, next_state: State) -> None:
         self.__state_enum = next_state
+        compositor.damage_all()
         self.state_obj: StateLike = self.state_dict.get(self.__state_enum)()
 
     def update(self):
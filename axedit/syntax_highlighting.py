@@ -1,17 +1,28 @@
-import ast
 import builtins
 import keyword
-import typing as t
-from typing import Any
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Iterable
 
 import pygame
 
 from axedit import shared
-from axedit.funcs import get_text, is_event_frame
+from axedit.analysis import is_pascal, name_analyzer
+from axedit.buffer import EditEvent, dirty_line_ranges
+from axedit.funcs import is_event_frame
+from axedit.lexers import Color, Lexer, Span, get_lexer
 from axedit.logs import logger
-from axedit.module_checker import is_module
+from axedit.render_cache import glyph_atlas, line_cache
 
 LOGICAL_PUNCTUATION = " .(){}[],:;/\\|+=-*%\"'"
+# Seconds each frame may spend lexing lines that are not on screen
+BACKGROUND_INDEX_BUDGET = 0.003
+# Columns of a line rendered and cached together, so only the chunks of
+# long lines that are on screen are ever drawn
+CHUNK_COLUMNS = 128
+# Columns on either side of a chunk the lexers of other files look at
+LEX_MARGIN = 512
 
 _KEYWORDS = keyword.kwlist[3:]
 _SINGLETONS = keyword.kwlist[:3]
@@ -19,147 +30,90 @@ _BUILTINS = dir(builtins)
 
 _MODULES = set()
 _CLASSES = set()
-_PRECEDENCE = []
-
-Color: t.TypeAlias = str
-
-
-class ImportVisitor(ast.NodeVisitor):
-    def __init__(self) -> None:
-        super().__init__()
-        self.first = True
-
-    def visit_ImportFrom(self, node: ast.ImportFrom | None):
-        if not self.first and not shared.import_line_changed:
-            return
-
-        mod_name = node.module
-        if node.module is None:
-            mod_name = "."
-
-        _MODULES.update(mod_name.split("."))
-
-        imports = []
-        for naming_node in node.names:
-            imports.append(naming_node.name)
-            if naming_node.asname is not None:
-                imports.append(naming_node.asname)
-
-        for imp in imports:
-            if is_module(mod_name, imp):
-                _MODULES.add(imp)
-            elif is_pascal(imp):
-                _CLASSES.add(imp)
-
-    def visit_Import(self, node: ast.Import):
-        if not self.first and not shared.import_line_changed:
-            return
-
-        for naming_node in node.names:
-            _MODULES.add(naming_node.name)
-
-            if hasattr(naming_node, "asname"):
-                _MODULES.add(naming_node.asname)
-
+# Bumped whenever new names change what the highlighted text looks like
+names_version = 0
+# Color of every word highlighted by name, compiled from the word classes
+_LEXICON: dict[str, Color] = {}
+
+
+def get_word_classes() -> list[tuple[str, Iterable[str]]]:
+    """Words highlighted by name and their theme colors, later classes win"""
+
+    word_classes = [
+        ("match", _BUILTINS),
+        ("class", _MODULES),
+        ("class", _CLASSES),
+        ("keyword", _KEYWORDS),
+        ("const", _SINGLETONS),
+        ("var", ("self",)),
+    ]
+    extra_words = shared.config.get("highlight", {}).get("words", {})
+    for color_name, words in extra_words.items():
+        if color_name not in shared.theme:
+            logger.warning(f"No theme color {color_name!r} to highlight words with")
+            continue
+        word_classes.append((color_name, [str(word) for word in words]))
 
-class ClassVisitor(ast.NodeVisitor):
-    def visit_ClassDef(self, node: ast.ClassDef) -> Any:
-        _CLASSES.add(node.name)
+    return word_classes
 
 
-import_visitor = ImportVisitor()
-class_visitor = ClassVisitor()
+def compile_lexicon() -> None:
+    _LEXICON.clear()
+    for color_name, words in get_word_classes():
+        _LEXICON.update(dict.fromkeys(words, shared.theme[color_name]))
 
 
 def apply_precedence(word: str) -> Color:
     word = word.strip()
-    final_color = shared.theme["default-fg"]
-
-    for color, subclass in _PRECEDENCE:
-        if word in subclass:
-            final_color = color
-
     if word.isdigit():
-        final_color = shared.theme["const"]
-
-    return final_color
+        return shared.theme["const"]
 
-
-def is_pascal(word: str) -> bool:
-    if not word:
-        return False
-    if word[0] == "_":
-        return is_pascal(word[1:])
-    return word[0].isupper() and word.find("_") == -1
-
-
-last_string_counter = 0
-within_line = True
-concluded_doc_string = True
+    return _LEXICON.get(word, shared.theme["default-fg"])
 
 
-def set_string_status(index: int) -> None:
-    global last_string_counter, within_line, concluded_doc_string
+def index_colors(row: str, in_doc_string: bool) -> tuple[list[Span], bool]:
+    """
+    Sorted spans covering the whole row, and whether a doc string is
+    still open at its end given whether one was open at its start
+    """
 
-    last_string_counter = 0
-    within_line = True
-    concluded_doc_string = True
+    color_ranges, in_doc_string = index_color_ranges(row, in_doc_string)
+    return to_spans(color_ranges, len(row)), in_doc_string
 
-    for row in shared.chars[:index]:
-        row = "".join(row)
-        final_index = len(row) - 1
 
-        if not concluded_doc_string and not (
-            row.find("'") != -1 or row.find('"') != -1
-        ):
-            within_line = False
-            # return {range(start_index, final_index + 1): shared.theme["string"]}
-            continue
-
-        string_counter = 0
+def to_spans(color_ranges: dict[range, Color], length: int) -> list[Span]:
+    """Flattens overlapping ranges, where later ones win, into spans"""
 
-        for current_index, char in enumerate(row):
-            if within_line and string_counter > 0:
-                string_counter -= 1
-                continue
+    default = shared.theme["default-fg"]
+    painted = [default] * length
+    for r, color in color_ranges.items():
+        start, stop = max(r.start, 0), min(r.stop, length)
+        if start < stop:
+            painted[start:stop] = [color] * (stop - start)
 
-            if char in "\"'":
-                within_line = True
-                starter = None
-                if row.count(char * 3) % 2 != 0:
-                    concluded_doc_string = not concluded_doc_string
-                    if concluded_doc_string:
-                        starter = 0
-                    string_pos = final_index
-                else:
-                    string_pos = row.find(char, current_index + 1)
-                incomplete_string = string_pos < 0
-                if incomplete_string:
-                    string_pos = int(10e6)
-
-                if starter is None:
-                    r = range(
-                        current_index,
-                        string_pos + 1,
-                    )
-                else:
-                    r = range(starter, string_pos + 1)
-
-                string_counter = string_pos - current_index
-                continue
+    spans = []
+    start = 0
+    for x in range(1, length + 1):
+        if x == length or painted[x] != painted[start]:
+            spans.append((start, x, painted[start]))
+            start = x
+    return spans
 
 
-def index_colors(row: str) -> dict[t.Generator, Color]:
-    global last_string_counter, within_line, concluded_doc_string
+def index_color_ranges(
+    row: str, in_doc_string: bool
+) -> tuple[dict[range, Color], bool]:
     color_ranges = {}
+    concluded_doc_string = not in_doc_string
 
     final_index = len(row) - 1
     acc = ""
     start_index = 0
 
     if not concluded_doc_string and not ("'" in row or '"' in row):
-        within_line = False
-        return {range(start_index, final_index + 1): shared.theme["string"]}
+        return {
+            range(start_index, final_index + 1): shared.theme["string"]
+        }, in_doc_string
 
     # if concluded_doc_string:
     #     if (single := row.find("'''")) != -1:
@@ -169,16 +123,16 @@ def index_colors(row: str) -> dict[t.Generator, Color]:
     #     return {range(start_index, end_index): shared.theme["string"]}
 
     string_counter = 0
+    triple_quote_counts = {quote: row.count(quote * 3) for quote in "\"'"}
 
     for current_index, char in enumerate(row):
-        if within_line and string_counter > 0:
+        if string_counter > 0:
             string_counter -= 1
             continue
 
         if char in "\"'":
-            within_line = True
             starter = None
-            if row.count(char * 3) % 2 != 0:
+            if triple_quote_counts[char] % 2 != 0:
                 concluded_doc_string = not concluded_doc_string
                 if concluded_doc_string:
                     starter = 0
@@ -208,19 +162,19 @@ def index_colors(row: str) -> dict[t.Generator, Color]:
 
             todo_index = row[current_index:].find("TODO")
             if todo_index == -1:
-                return color_ranges
+                return color_ranges, not concluded_doc_string
 
             todo_index += current_index
             color_ranges[range(todo_index, todo_index + 4)] = shared.theme["dep"]
 
-            return color_ranges
+            return color_ranges, not concluded_doc_string
 
         if char == "@":
             bracket_index = row.find("(")
             end_index = len(row) if bracket_index == -1 else bracket_index
             r = range(current_index, end_index)
             color_ranges[r] = shared.theme["const"]
-            return color_ranges
+            return color_ranges, not concluded_doc_string
 
         if char in LOGICAL_PUNCTUATION:
             color = apply_precedence(acc)
@@ -246,24 +200,38 @@ def index_colors(row: str) -> dict[t.Generator, Color]:
             color = apply_precedence(acc)
             color_ranges[range(start_index, current_index + 1)] = color
 
-    return color_ranges
+    return color_ranges, not concluded_doc_string
 
 
-def line_wise_stitching(row: str, color_ranges: dict) -> pygame.Surface:
-    image = pygame.Surface((shared.srect.width, shared.FONT_HEIGHT), pygame.SRCALPHA)
-    for x, char in enumerate(row):
-        color = shared.theme["default-fg"]
-        for range, ranged_color in color_ranges.items():
-            if x in range:
-                color = ranged_color
+def line_wise_stitching(
+    row: str, spans: list[Span], y: int
+) -> list[tuple[pygame.Surface, tuple[int, int]]]:
+    """Cached glyphs of a row and where they go, ready for `fblits`"""
 
-        try:
-            char_surf = shared.FONT.render(char, True, color)
-        except pygame.error:
-            continue
-        image.blit(char_surf, (x * shared.FONT_WIDTH, 0))
+    blits = []
+    for start, end, color in spans:
+        for x in range(start, end):
+            char = row[x]
+            if char == " ":
+                continue
+            glyph = glyph_atlas.get(char, color)
+            if glyph is not None:
+                blits.append((glyph, (x * shared.FONT_WIDTH, y)))
+
+    return blits
 
-    return image
+
+def render_line(row: str, spans: list[Span]) -> pygame.Surface | None:
+    """A chunk of a row drawn on its own surface, `None` if it is blank"""
+
+    if not row.strip():
+        return None
+
+    surf = pygame.Surface(
+        (len(row.rstrip()) * shared.FONT_WIDTH, shared.FONT_HEIGHT), pygame.SRCALPHA
+    )
+    surf.fblits(line_wise_stitching(row, spans, 0))
+    return surf
 
 
 def is_necessary_to_render(y: int, line: str) -> bool:
@@ -279,86 +247,336 @@ def is_necessary_to_render(y: int, line: str) -> bool:
 
 
 prev_image = None
-colors = []
+image: pygame.Surface | None = None
+# Line shown at the top of `image`, and the screen, font and horizontal
+# scroll it was drawn for
+rendered_offset: int | None = None
+rendered_layout: tuple[tuple[int, int], int, int] | None = None
+# Colors of each line, `None` for lines colored again once they are shown
+colors: list[list[Span] | None] = []
+# Whether a doc string is still open at the end of each line, the lexer
+# state the next line starts from. Only the states above `lexed_until`
+# are known to be right. Below it they are what they were before the last
+# edits, `None` for edited lines, and tell when re-lexing can stop
+line_states: list[bool | None] = []
+lexed_until = 0
+colors_version: int | None = None
+# Lexes the rows on screen of files that are not Python, which are not
+# indexed into `colors` up front
+lexer: Lexer | None = None
 should_index_colors = False
 
 
+def forget_all_colors() -> None:
+    """Lexes the whole document again, as it is shown"""
+
+    global colors, line_states, lexed_until
+    colors = [None] * len(shared.chars)
+    line_states = [None] * len(shared.chars)
+    lexed_until = 0
+
+
+def forget_colors() -> None:
+    """Colors every line again as it is shown, the lexer states still hold"""
+
+    global colors
+    colors = [None] * len(shared.chars)
+
+
+def forget_edited_colors(events: list[EditEvent]) -> None:
+    global lexed_until
+    for event in events:
+        if event.y < lexed_until < len(line_states):
+            # The states below were lexed from other lines above them than
+            # the ones that are lexed again, so skipping must stop there
+            line_states[lexed_until] = None
+        edited = slice(event.y, event.y + event.old_line_count)
+        colors[edited] = [None] * event.new_line_count
+        line_states[edited] = [None] * event.new_line_count
+        below = event.y + event.new_line_count
+        if event.new_line_count < event.old_line_count and below < len(line_states):
+            # The line that moved up follows another line than before, so
+            # lexing must not converge before reaching it
+            colors[below] = None
+            line_states[below] = None
+        lexed_until = min(lexed_until, event.y)
+
+
+def lex_until(stop: int, deadline: float | None = None) -> None:
+    """
+    Lexes from `lexed_until` down to `stop`, or until `deadline`. Lines
+    are skipped from where a line ends in the state it had before, down
+    to the next edited line.
+    """
+
+    global lexed_until
+    y = lexed_until
+    in_doc_string = line_states[y - 1] if y > 0 else False
+    while y < min(stop, len(line_states)):
+        spans, in_doc_string = index_colors(shared.chars[y], in_doc_string)
+        converged = line_states[y] == in_doc_string
+        colors[y] = spans
+        line_states[y] = in_doc_string
+        y += 1
+
+        if converged:
+            y = get_next_edited_line(y)
+            in_doc_string = line_states[y - 1]
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+
+    lexed_until = max(y, lexed_until)
+
+
+def get_next_edited_line(start: int) -> int:
+    try:
+        return line_states.index(None, start)
+    except ValueError:
+        return len(line_states)
+
+
+def color_rows(rows: range) -> None:
+    """Makes sure the colors of `rows` are known"""
+
+    missing = len(shared.chars) - len(colors)
+    if missing > 0:
+        # A mapped file that is still being indexed grew
+        colors.extend([None] * missing)
+        line_states.extend([None] * missing)
+
+    lex_until(rows.stop)
+    for y in range(rows.start, min(rows.stop, len(colors))):
+        if colors[y] is None:
+            in_doc_string = line_states[y - 1] if y > 0 else False
+            colors[y], _ = index_colors(shared.chars[y], in_doc_string)
+
+
+def index_in_background() -> None:
+    """
+    Lexes a little of what is left each frame, so jumping far down a
+    file does not have to lex everything above it
+    """
+
+    if (
+        lexer is not None
+        or colors_version != shared.chars.version
+        or lexed_until >= len(line_states)
+    ):
+        return
+
+    lex_until(len(line_states), time.perf_counter() + BACKGROUND_INDEX_BUDGET)
+    # Keeps the main loop from sleeping until it is done
+    shared.animating = True
+
+
+@dataclass(slots=True)
+class ColorCache:
+    """Highlighter state of a document that is not active"""
+
+    colors: list[list[Span] | None]
+    line_states: list[bool | None]
+    lexed_until: int
+    version: int | None
+    lexer: Lexer | None
+    modules: set[str]
+    classes: set[str]
+
+
+def get_color_cache() -> ColorCache:
+    return ColorCache(
+        colors,
+        line_states,
+        lexed_until,
+        colors_version,
+        lexer,
+        _MODULES.copy(),
+        _CLASSES.copy(),
+    )
+
+
+def set_color_cache(cache: ColorCache | None) -> None:
+    """Restores a document's highlighter state, `None` to start over"""
+
+    global colors, line_states, lexed_until, colors_version, lexer
+    global prev_image, rendered_offset
+    prev_image = None
+    rendered_offset = None
+    _MODULES.clear()
+    _CLASSES.clear()
+    if cache is None:
+        colors, line_states, lexed_until = [], [], 0
+        colors_version, lexer = None, None
+    else:
+        colors, line_states = cache.colors, cache.line_states
+        lexed_until = cache.lexed_until
+        colors_version, lexer = cache.version, cache.lexer
+        _MODULES.update(cache.modules)
+        _CLASSES.update(cache.classes)
+    compile_lexicon()
+
+
+def apply_names() -> bool:
+    """Takes the names found by the analyzer, `True` if they changed"""
+
+    global names_version
+    names = name_analyzer.take_result()
+    if names is None or (names.modules, names.classes) == (_MODULES, _CLASSES):
+        return False
+
+    _MODULES.clear()
+    _MODULES.update(names.modules)
+    _CLASSES.clear()
+    _CLASSES.update(names.classes)
+    compile_lexicon()
+    names_version += 1
+    return True
+
+
+def get_names_version() -> int:
+    return names_version
+
+
 def apply_syntax_highlighting() -> pygame.Surface:
-    global _PRECEDENCE
-    if shared.theme_changed or not _PRECEDENCE:
-        _PRECEDENCE = [
-            (shared.theme["match"], _BUILTINS),
-            (shared.theme["class"], _MODULES),
-            (shared.theme["class"], _CLASSES),
-            (shared.theme["keyword"], _KEYWORDS),
-            (shared.theme["const"], _SINGLETONS),
-            (shared.theme["var"], ["self"]),
-        ]
-    global prev_image
+    global prev_image, image, rendered_offset, rendered_layout, lexer
+    layout = shared.srect.size, shared.FONT_HEIGHT, int(shared.scroll.x)
+    file_lexer = get_file_lexer()
     if (
         not shared.theme_changed
         and (not is_event_frame(pygame.VIDEORESIZE))
         and (not shared.chars_changed)
         and (not shared.scrolling)
+        and layout == rendered_layout
+        and file_lexer is lexer
+        and not (lexer is None and name_analyzer.has_result())
         and prev_image is not None
     ):
         return prev_image
 
-    global should_index_colors
+    global colors, line_states, lexed_until, should_index_colors, colors_version
+    events = None
+    if colors_version is not None and file_lexer is lexer:
+        events = shared.chars.events_since(colors_version)
+    lexer = file_lexer
+
     should_index_colors = False
-    try:
-        parsed_source = ast.parse(get_text())
-        # Highlight modules
-        temp_mod = _MODULES.copy()
-        if shared.import_line_changed:
-            _MODULES.clear()
-            import_visitor.visit(parsed_source)
-            import_visitor.first = False
-
-        # Highlight classes
-        temp_class = _CLASSES.copy()
-        _CLASSES.clear()
-        class_visitor.visit(parsed_source)
-
-        should_index_colors = temp_class != _CLASSES or temp_mod != _MODULES
-    except SyntaxError:
-        pass
+    if lexer is None:
+        # Scrolling alone changes no imports or classes
+        if events != []:
+            name_analyzer.request(now=events is None)
+        should_index_colors = apply_names()
 
     safety_padding = 2
     n_lines_to_render = int(shared.srect.height / shared.FONT_HEIGHT) + safety_padding
     scroll_offset = int(-shared.scroll.y / shared.FONT_HEIGHT)
-    visible_lines = shared.chars[scroll_offset : scroll_offset + n_lines_to_render]
-    image = pygame.Surface(shared.srect.size, pygame.SRCALPHA)
 
-    global colors
-    if prev_image is None or shared.saved or should_index_colors:
-        global last_string_counter, within_line, concluded_doc_string
-        last_string_counter = 0
-        within_line = True
-        concluded_doc_string = True
-
-        # print(f"{prev_image is None=}, {shared.saved=}, {should_index_colors=}")
-        colors = [index_colors("".join(row)) for row in shared.chars]
-
-    if shared.chars_changed:
-        if len(colors) < len(shared.chars):
-            colors.insert(shared.cursor_pos.y, {})
-        elif len(colors) > len(shared.chars):
-            colors.pop(shared.cursor_pos.y)
-
-        set_string_status(shared.cursor_pos.y)
-        try:
-            colors[shared.cursor_pos.y] = index_colors(
-                "".join(shared.chars[shared.cursor_pos.y])
-            )
-        except IndexError:
-            pass
+    recolored = events is None or shared.theme_changed or should_index_colors
+    # Lines are only lexed once they are shown, or in the background
+    if lexer is not None:
+        colors, line_states, lexed_until = [], [], 0
+    elif events is None:
+        forget_all_colors()
+    else:
+        forget_edited_colors(events)
+        if recolored:
+            forget_colors()
+    colors_version = shared.chars.version
+
+    glyph_atlas.refresh()
+    line_cache.refresh()
+    if (
+        not recolored
+        and not events
+        and image is not None
+        and rendered_offset is not None
+        and layout == rendered_layout
+    ):
+        rows = scroll_image(scroll_offset - rendered_offset, n_lines_to_render)
+    else:
+        if image is None or image.get_size() != shared.srect.size:
+            image = pygame.Surface(shared.srect.size, pygame.SRCALPHA)
+        image.fill((0, 0, 0, 0))
+        rows = range(n_lines_to_render)
+    render_rows(rows, scroll_offset, layout[2])
+    rendered_offset, rendered_layout = scroll_offset, layout
+
+    # Nothing draws onto the returned image, so it is reused next frame
+    prev_image = image
+    return image
 
-    for y, row in enumerate(visible_lines):
-        row = "".join(row)
-        color_ranges = colors[y + scroll_offset]
-        row_image = line_wise_stitching(row, color_ranges)
-        image.blit(row_image, (0, y * shared.FONT_HEIGHT))
 
-    prev_image = image.copy()
-    return image
+def get_file_lexer() -> Lexer | None:
+    """The lexer of the open file, `None` for Python which is indexed here"""
+
+    if shared.file_name is not None and shared.file_name.endswith(".py"):
+        return None
+    return get_lexer(shared.file_name)
+
+
+def scroll_image(delta: int, n_rows: int) -> range:
+    """
+    Moves the rendered rows by `delta` lines and clears the ones that
+    come into view, returns the rows that still need to be rendered
+    """
+
+    if abs(delta) >= n_rows:
+        image.fill((0, 0, 0, 0))
+        return range(n_rows)
+
+    image.scroll(0, -delta * shared.FONT_HEIGHT)
+    exposed = image.get_rect()
+    if delta > 0:
+        # The row cut off at the bottom was never fully drawn
+        full_rows = image.get_height() // shared.FONT_HEIGHT
+        rows = range(max(full_rows - delta, 0), n_rows)
+        exposed.top = rows.start * shared.FONT_HEIGHT
+    else:
+        rows = range(0, -delta)
+        exposed.height = len(rows) * shared.FONT_HEIGHT
+
+    image.fill((0, 0, 0, 0), exposed)
+    return rows
+
+
+def render_rows(rows: range, scroll_offset: int, scroll_x: int) -> None:
+    first = scroll_offset + rows.start
+    lines = shared.chars[first : scroll_offset + rows.stop]
+    blits = []
+    if lexer is None:
+        color_rows(range(first, first + len(lines)))
+
+    chunk_width = CHUNK_COLUMNS * shared.FONT_WIDTH
+    first_column = max(scroll_x, 0) // chunk_width * CHUNK_COLUMNS
+    stop_column = (scroll_x + image.get_width()) // chunk_width * CHUNK_COLUMNS
+    stop_column += CHUNK_COLUMNS
+    for y, row in enumerate(lines, rows.start):
+        end = min(len(row), stop_column)
+        if first_column >= end:
+            continue
+
+        if lexer is None:
+            spans = colors[y + scroll_offset]
+        else:
+            spans = lexer(row, max(first_column - LEX_MARGIN, 0), end + LEX_MARGIN)
+        for start in range(first_column, end, CHUNK_COLUMNS):
+            stop = start + CHUNK_COLUMNS
+            chunk = row[start:stop]
+            surf = line_cache.get(chunk, clip_spans(spans, start, stop), render_line)
+            if surf is not None:
+                x = start * shared.FONT_WIDTH - scroll_x
+                blits.append((surf, (x, y * shared.FONT_HEIGHT)))
+    image.fblits(blits)
+
+
+def clip_spans(spans: list[Span], start: int, stop: int) -> list[Span]:
+    """The parts of sorted `spans` in the columns `[start, stop)`, from `start`"""
+
+    clipped = []
+    index = max(bisect_right(spans, start, key=lambda span: span[0]) - 1, 0)
+    while index < len(spans) and spans[index][0] < stop:
+        span_start, span_end, color = spans[index]
+        if span_end > start:
+            clipped.append(
+                (max(span_start, start) - start, min(span_end, stop) - start, color)
+            )
+        index += 1
+    return clipped
@@ -3,6 +3,7 @@ from pathlib import Path
 import yaml
 
 from axedit import shared
+from axedit.syntax_highlighting import compile_lexicon
 
 
 def get_available_theme_names() -> list[str]:
@@ -38,3 +39,5 @@ def apply_theme(theme_name: str) -> None:
     theme_path = shared.THEMES_PATH / f"{theme_name}.yaml"
     with open(theme_path) as f:
         shared.theme = _get_readable_theme(yaml.safe_load(f))
+    # Words highlighted by name are colored from the theme
+    compile_lexicon()
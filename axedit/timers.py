@@ -0,0 +1,153 @@
+"""
+One scheduler for every deadline in the editor.
+
+Components create `Timer`s instead of polling a clock each frame. The
+scheduler reads the clock once per frame, runs the callbacks of the
+timers that are due, and knows the earliest deadline, which is how long
+the idle main loop may sleep.
+
+Callbacks that are bound methods are held weakly, so the timers of a
+discarded component stop with it. A leased timer only keeps repeating
+while its owner calls `keep_alive` between firings, so something that
+stopped being updated, like a hidden blinking cursor, does not wake the
+loop.
+"""
+
+import heapq
+import inspect
+import itertools
+import time
+import typing as t
+import weakref
+
+Callback: t.TypeAlias = t.Callable[[], None]
+
+
+class Timer:
+    def __init__(
+        self,
+        scheduler: "Scheduler",
+        interval: float,
+        callback: Callback | None,
+        repeat: bool,
+        lease: bool,
+    ) -> None:
+        self.scheduler = scheduler
+        self.interval = interval
+        self.repeat = repeat
+        self.lease = lease
+        self.kept = True
+        self.deadline: float | None = None
+        # Matches the heap entry that is current, older entries are stale
+        self.entry_id: int | None = None
+
+        self.callback: t.Callable[[], Callback | None] | None
+        if callback is None:
+            self.callback = None
+        elif inspect.ismethod(callback):
+            self.callback = weakref.WeakMethod(callback)
+        else:
+            self.callback = lambda: callback
+
+    @property
+    def active(self) -> bool:
+        return self.deadline is not None
+
+    def start(self, interval: float | None = None) -> None:
+        """(Re)arms the timer to fire `interval` seconds from now"""
+
+        if interval is not None:
+            self.interval = interval
+        self.kept = True
+        self.scheduler.push(self, time.perf_counter() + self.interval)
+
+    def stop(self) -> None:
+        self.deadline = None
+        self.entry_id = None
+
+    def keep_alive(self) -> None:
+        """Lets a leased timer fire again, restarting it if it paused"""
+
+        self.kept = True
+        if not self.active:
+            self.start()
+
+    def remaining(self) -> float:
+        if self.deadline is None:
+            return 0
+        return self.deadline - self.scheduler.now
+
+
+class Scheduler:
+    def __init__(self) -> None:
+        self.heap: list[tuple[float, int, Timer]] = []
+        self.ids = itertools.count()
+        self.now = time.perf_counter()
+
+    def create(
+        self,
+        interval: float,
+        callback: Callback | None = None,
+        repeat: bool = False,
+        lease: bool = False,
+    ) -> Timer:
+        """A timer that is not running yet"""
+
+        return Timer(self, interval, callback, repeat, lease)
+
+    def after(self, delay: float, callback: Callback | None = None) -> Timer:
+        timer = self.create(delay, callback)
+        timer.start()
+        return timer
+
+    def every(self, interval: float, callback: Callback, lease: bool = False) -> Timer:
+        timer = self.create(interval, callback, repeat=True, lease=lease)
+        timer.start()
+        return timer
+
+    def push(self, timer: Timer, deadline: float) -> None:
+        timer.deadline = deadline
+        timer.entry_id = next(self.ids)
+        heapq.heappush(self.heap, (deadline, timer.entry_id, timer))
+
+    def drop_stale(self) -> None:
+        while self.heap and self.heap[0][2].entry_id != self.heap[0][1]:
+            heapq.heappop(self.heap)
+
+    def next_deadline(self) -> float | None:
+        self.drop_stale()
+        if not self.heap:
+            return None
+        return self.heap[0][0]
+
+    def update(self) -> None:
+        """Runs the callbacks of every timer that is due"""
+
+        self.now = time.perf_counter()
+        self.drop_stale()
+        while self.heap and self.heap[0][0] <= self.now:
+            _, _, timer = heapq.heappop(self.heap)
+            timer.stop()
+            self.fire(timer)
+            self.drop_stale()
+
+    def fire(self, timer: Timer) -> None:
+        callback = None
+        if timer.callback is not None:
+            callback = timer.callback()
+            if callback is None:
+                # Its owner is gone
+                return
+
+        if timer.lease:
+            if not timer.kept:
+                return
+            timer.kept = False
+        if timer.repeat:
+            self.push(timer, self.now + timer.interval)
+
+        if callback is not None:
+            callback()
+
+
+scheduler = Scheduler()